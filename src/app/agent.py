@@ -1,44 +1,73 @@
 """
 Core agent for music recommendations using the Planning Agent architecture.
 """
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, AsyncIterator, Tuple
 import logging
-import json
 
-from graph import get_graph, get_approval_graph
+from langgraph.types import Command
+
+from graph import get_graph
 from state import create_initial_state
+from storage.state_codec import project_state
+from storage.track_store import aggregate_tracks
 
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
+# Nodes whose output carries a fresh plan
+PLAN_NODES = {"router", "planner", "replanner"}
+
+
+def thread_config(thread_id: str) -> Dict[str, Any]:
+    """Run config that keys the graph's checkpoints by thread."""
+    return {"configurable": {"thread_id": thread_id}}
 
-def extract_tracks_from_results(step_results: Dict[str, Any]) -> List[Dict]:
-    """Extract all tracks from step results for playlist storage."""
-    all_tracks = []
 
-    for result in step_results.values():
-        if isinstance(result, dict) and "tracks" in result:
-            tracks = result["tracks"]
-            if isinstance(tracks, list):
-                all_tracks.extend(tracks)
+async def is_awaiting_approval(thread_id: str) -> bool:
+    """Whether the thread has a run paused at the approval prompt."""
+    graph = await get_graph()
+    snapshot = await graph.aget_state(thread_config(thread_id))
+    return bool(snapshot.interrupts)
 
-    # Remove duplicates by URI
-    seen_uris = set()
-    unique_tracks = []
-    for track in all_tracks:
-        uri = track.get("uri", "")
-        if uri and uri not in seen_uris:
-            seen_uris.add(uri)
-            unique_tracks.append(track)
 
-    return unique_tracks
+async def discard_thread(thread_id: str) -> None:
+    """Drop every checkpoint of a thread, e.g. a run paused at approval that won't be resumed."""
+    graph = await get_graph()
+    await graph.checkpointer.adelete_thread(thread_id)
+
+
+def _graph_input(
+    query: str,
+    session_id: str,
+    history: Optional[List[Dict]],
+    resume: bool,
+    model_tiers: Optional[Dict[str, str]],
+    formatter_mode: Optional[str]
+) -> Any:
+    """Initial state for a new run, or a resume command carrying the user's reply."""
+    if resume:
+        # approval_handler_node interprets the reply; overrides apply to the rest of the run
+        return Command(
+            resume=query,
+            update={"model_tiers": model_tiers, "formatter_mode": formatter_mode}
+        )
+    return create_initial_state(
+        query=query,
+        session_id=session_id,
+        history=history,
+        model_tiers=model_tiers,
+        formatter_mode=formatter_mode
+    )
 
 
 async def get_music_recommendations(
     query: str,
     session_id: str,
     history: Optional[List[Dict]] = None,
-    pending_state: Optional[Dict] = None
+    resume: bool = False,
+    model_tiers: Optional[Dict[str, str]] = None,
+    formatter_mode: Optional[str] = None,
+    thread_id: Optional[str] = None
 ) -> Dict:
     """
     Get music recommendations via the Planning Agent workflow.
@@ -47,45 +76,30 @@ async def get_music_recommendations(
         query: User's search query (or reply to approval prompt)
         session_id: Session identifier for memory operations
         history: Optional conversation history
-        pending_state: State from a paused approval flow (for continuation)
+        resume: Resume the thread's run paused at the approval prompt, with query as the reply
+        model_tiers: Optional node -> model tier overrides for this request
+        formatter_mode: Optional formatter mode (llm, template, flair) for this request
+        thread_id: Checkpoint thread for the run; defaults to session_id
 
     Returns:
         Dict with 'response', 'state', 'playlist', and 'awaiting_approval' keys
     """
+    config = thread_config(thread_id or session_id)
     try:
-        # Check if this is a continuation from approval pause
-        if pending_state is not None:
+        if resume:
             logger.info(f"Continuing from approval for session {session_id}")
-            return await _continue_from_approval(query, pending_state, session_id)
 
-        # Create initial state for new request
-        initial_state = create_initial_state(
-            query=query,
-            session_id=session_id,
-            history=history
+        graph = await get_graph()
+        if not resume:
+            # Leftovers of a run that died mid-way must not merge into this one
+            await graph.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+        final_state = await graph.ainvoke(
+            _graph_input(query, session_id, history, resume, model_tiers, formatter_mode),
+            config,
+            durability="exit"
         )
 
-        # Run the planning agent graph
-        graph = get_graph()
-        final_state = await graph.ainvoke(initial_state)
-
-        # Check if we're pausing for approval
-        if final_state.get("awaiting_approval"):
-            logger.info(f"Pausing for approval - session {session_id}")
-            return {
-                "response": final_state.get("formatted_response", ""),
-                "state": _serialize_state(final_state),
-                "playlist": extract_tracks_from_results(final_state.get("step_results", {})),
-                "awaiting_approval": True,
-                "pending_state": _serialize_state(final_state)
-            }
-
-        return {
-            "response": final_state.get("formatted_response", ""),
-            "state": _serialize_state(final_state),
-            "playlist": extract_tracks_from_results(final_state.get("step_results", {})),
-            "awaiting_approval": False
-        }
+        return await _finish_run(graph, config, final_state)
 
     except Exception as e:
         logger.error(f"Error in music recommendations: {e}", exc_info=True)
@@ -97,78 +111,106 @@ async def get_music_recommendations(
         }
 
 
-async def _continue_from_approval(
-    user_reply: str,
-    pending_state: Dict,
-    session_id: str
-) -> Dict:
+async def stream_music_recommendations(
+    query: str,
+    session_id: str,
+    history: Optional[List[Dict]] = None,
+    resume: bool = False,
+    model_tiers: Optional[Dict[str, str]] = None,
+    formatter_mode: Optional[str] = None,
+    thread_id: Optional[str] = None
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
     """
-    Continue execution after user responds to approval prompt.
+    Run the Planning Agent workflow, yielding progress as (event, data) pairs.
 
-    The approval_handler_node will use LLM to interpret the user's reply
-    and decide whether to approve, reject, or ask for clarification.
+    Events, in the order they can occur:
+    - plan: a plan is ready ({"plan": [...]})
+    - step_started / step_finished: executor progress, with track lists
+    - token: a chunk of the formatted response ({"text": ...})
+    - done: the same dict get_music_recommendations() returns
 
-    Args:
-        user_reply: The user's response to the approval prompt
-        pending_state: The state from when we paused for approval
-        session_id: Session identifier
-
-    Returns:
-        Dict with results
+    Args are the same as get_music_recommendations().
     """
-    try:
-        # Reconstruct the state with the user's reply
-        state = pending_state.copy()
-        state["query"] = user_reply  # Pass user reply for LLM interpretation
-        state["session_id"] = session_id
-
-        logger.debug(f"Continuing approval flow with user reply: {user_reply[:100]}")
-
-        # Run the approval continuation graph
-        # approval_handler_node will interpret the reply and decide
-        graph = get_approval_graph()
-        final_state = await graph.ainvoke(state)
-
-        logger.debug(f"Continuation result: awaiting_approval={final_state.get('awaiting_approval')}")
-
-        # Safety net: if we still have awaiting_approval=True and it's the same prompt,
-        # something went wrong - but let's respect what the graph decided
-        if final_state.get("awaiting_approval"):
-            logger.warning(f"Continuation still awaiting approval for session {session_id}")
-            return {
-                "response": final_state.get("formatted_response", ""),
-                "state": _serialize_state(final_state),
-                "playlist": extract_tracks_from_results(final_state.get("step_results", {})),
-                "awaiting_approval": True,
-                "pending_state": _serialize_state(final_state)
-            }
+    if resume:
+        logger.info(f"Continuing from approval for session {session_id}")
+    config = thread_config(thread_id or session_id)
 
-        return {
-            "response": final_state.get("formatted_response", ""),
-            "state": _serialize_state(final_state),
-            "playlist": extract_tracks_from_results(final_state.get("step_results", {})),
-            "awaiting_approval": False
-        }
+    token_run_id = None
+    streamed = ""
+    try:
+        graph = await get_graph()
+        if not resume:
+            await graph.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+        async for event in graph.astream_events(
+            _graph_input(query, session_id, history, resume, model_tiers, formatter_mode),
+            config,
+            version="v2",
+            durability="exit"
+        ):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_custom_event":
+                yield event["name"], event["data"]
+
+            elif kind == "on_chain_end" and event["name"] in PLAN_NODES and node == event["name"]:
+                output = event["data"].get("output")
+                if isinstance(output, dict) and output.get("plan"):
+                    yield "plan", {"plan": output["plan"]}
+
+            elif kind == "on_chat_model_stream" and node == "format_assistant":
+                # Follow one model run only, in case the call was hedged
+                token_run_id = token_run_id or event["run_id"]
+                text = event["data"]["chunk"].content
+                if event["run_id"] == token_run_id and isinstance(text, str) and text:
+                    streamed += text
+                    yield "token", {"text": text}
+
+        snapshot = await graph.aget_state(config)
+        result = await _finish_run(graph, config, snapshot.values, bool(snapshot.interrupts))
 
     except Exception as e:
-        logger.error(f"Error continuing from approval: {e}", exc_info=True)
-        return {
+        logger.error(f"Error streaming music recommendations: {e}", exc_info=True)
+        yield "done", {
             "response": f"Sorry, I encountered an error: {str(e)}",
             "state": {},
             "playlist": [],
             "awaiting_approval": False
         }
+        return
 
+    # Template-rendered text (or the rest of it, after an LLM opener) never
+    # came through the model stream; send it as one final token
+    response = result["response"]
+    if response.startswith(streamed) and len(response) > len(streamed):
+        yield "token", {"text": response[len(streamed):]}
 
-def _serialize_state(state: dict) -> dict:
+    yield "done", result
+
+
+async def _finish_run(graph, config: Dict[str, Any], final_state: Dict, paused: Optional[bool] = None) -> Dict:
     """
-    Serialize state for storage in Firestore.
+    Build the API result for a run and drop its checkpoints once it has finished.
+
+    Only runs paused at the approval prompt keep a checkpoint to resume from.
     """
-    serializable = {}
-    for key, value in state.items():
-        try:
-            json.dumps(value)
-            serializable[key] = value
-        except (TypeError, ValueError):
-            serializable[key] = str(value)
-    return serializable
+    if paused is None:
+        paused = "__interrupt__" in final_state
+
+    if paused:
+        logger.info(f"Pausing for approval - thread {config['configurable']['thread_id']}")
+    else:
+        await graph.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+
+    return _build_result(final_state)
+
+
+def _build_result(final_state: Dict) -> Dict:
+    """Shape a finished graph state into the response returned to the API."""
+    return {
+        "response": final_state.get("formatted_response", ""),
+        "state": project_state(final_state),
+        "playlist": aggregate_tracks(final_state),
+        "awaiting_approval": bool(final_state.get("awaiting_approval"))
+    }
+
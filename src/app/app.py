@@ -3,19 +3,70 @@ FastAPI application for the Planning Agent music recommendation service.
 """
 import traceback
 import os
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from functools import wraps
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from pydantic import BaseModel, PrivateAttr
 from typing import Optional, Dict, Any
-from agent import get_music_recommendations
+from agent import get_music_recommendations, stream_music_recommendations, is_awaiting_approval
+from config.llm_config import prewarm_clients, close_clients
+from config.llm_hedging import get_hedged_invoker
+from config.llm_metrics import get_llm_tracker
+from storage.firestore_store import get_session_store
+from storage.session_cache import get_session_cache
+from storage.checkpointer import get_checkpointer, close_checkpointer
+from storage.state_codec import encode_state, get_state_size_stats, dumps
+from storage.track_store import get_track_table_cache
+from tools.runtime import get_tool_runtime
+from tools.spotify_tools import close_spotify_client
+from tools.search_cache import get_search_cache
+from tools.track_catalog import get_track_catalog
+from tools.spotify_scheduler import get_spotify_scheduler
+from nodes.plan_cache import get_plan_cache
+from nodes.router import get_router_stats
+from nodes.speculation import get_speculation_registry
+from storage.mood_catalog import get_mood_catalog, is_mood_catalog_enabled
+from mood_catalog_job import run_periodically, schedule_refresh
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials
 from fastapi.middleware.cors import CORSMiddleware
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown hooks."""
+    await prewarm_clients()
+    await get_checkpointer()
+
+    # Keep precomputed answers for the suggestion chips and top intents fresh
+    catalog_task = None
+    if is_mood_catalog_enabled() and not os.getenv("MOOD_CATALOG_PATH"):
+        logger.warning("MOOD_CATALOG_ENABLED is set but MOOD_CATALOG_PATH is not; the mood catalog is off")
+    refresh_interval = float(os.getenv("MOOD_CATALOG_REFRESH_SECONDS", "21600"))
+    if get_mood_catalog() is not None and refresh_interval > 0:
+        catalog_task = asyncio.create_task(run_periodically(refresh_interval))
+
+    yield
+
+    if catalog_task is not None:
+        catalog_task.cancel()
+    mood_catalog = get_mood_catalog()
+    if mood_catalog is not None:
+        await asyncio.to_thread(mood_catalog.flush_counts)
+    # Make sure write-behind batches reach Firestore before exiting
+    await get_session_store().writer.flush()
+    await close_checkpointer()
+    get_tool_runtime().shutdown()
+    close_spotify_client()
+    await close_clients()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +83,9 @@ class QueryText(BaseModel):
     history: list = []
     session_id: str
     playlist: str = ""
+    model_tiers: Optional[Dict[str, str]] = None  # e.g. {"format_assistant": "reasoning"}
+    formatter_mode: Optional[str] = None  # llm, template or flair
+    _awaiting_approval: bool = PrivateAttr(default=False)
 
 
 # Initialize Firestore
@@ -47,92 +101,106 @@ if not firebase_admin._apps:
             'databaseURL': os.getenv('FIREBASE_DB_URL')
         })
 
-db = firestore.client()
+async def load_session_context(query_text: QueryText) -> None:
+    """
+    Fetch history and whether a run is paused for approval onto the request model.
 
+    History comes from the async session store and the approval pause from
+    the local checkpointer; both are read concurrently.
+    """
+    history, awaiting_approval = await asyncio.gather(
+        get_session_store().get_history(query_text.session_id),
+        is_awaiting_approval(query_text.session_id)
+    )
+    query_text.history = history
+    query_text._awaiting_approval = awaiting_approval
 
-def get_pending_state(session_id: str) -> Optional[Dict[str, Any]]:
-    """Get pending approval state from Firestore."""
-    try:
-        doc_ref = db.collection('pending_approvals').document(session_id)
-        doc = doc_ref.get()
-        if doc.exists:
-            state = doc.to_dict().get('state')
-            logger.debug(f"Found pending state for {session_id}: keys={list(state.keys()) if state else None}")
-            return state
-        return None
-    except Exception as e:
-        logger.error(f"Error getting pending state: {e}")
-        return None
 
+def persist_turn(session_id: str, result: Any) -> Any:
+    """
+    Clean up a turn's result and stage its writes.
 
-def save_pending_state(session_id: str, state: Dict[str, Any]) -> None:
-    """Save pending approval state to Firestore."""
-    try:
-        doc_ref = db.collection('pending_approvals').document(session_id)
-        doc_ref.set({'state': state})
-        logger.debug(f"Saved pending state for {session_id}")
-    except Exception as e:
-        logger.error(f"Error saving pending state: {e}")
+    The writes are committed as one batch in the background once the
+    response is on its way. The state is encoded once: the same bytes go
+    into the response and, compressed, into Firestore.
+    """
+    store = get_session_store()
 
+    # Clean up response if needed
+    if isinstance(result, dict) and "response" in result:
+        result["response"] = result["response"].replace(
+            "<END_CONVERSATION>", ""
+        )
 
-def clear_pending_state(session_id: str) -> None:
-    """Clear pending approval state from Firestore."""
-    try:
-        doc_ref = db.collection('pending_approvals').document(session_id)
-        doc_ref.delete()
-        logger.debug(f"Cleared pending state for {session_id}")
-    except Exception as e:
-        logger.error(f"Error clearing pending state: {e}")
+    batch = store.new_write_batch(session_id)
+
+    # Save playlist results if present
+    if isinstance(result, dict) and "playlist" in result and result["playlist"]:
+        batch.save_last_playlist(result["playlist"])
+
+    # Save updated history after execution
+    if isinstance(result, dict) and "state" in result:
+        encoded = encode_state(result["state"])
+        get_state_size_stats().record(encoded)
+        batch.save_history(result["state"], encoded)
+        result["state"] = encoded.fragment()
+
+    store.submit(batch)
+    return result
 
 
 def fetch_hist():
     """
     Decorator to fetch history before execution and save state after.
+
+    Whether the session is paused for approval is handed to the endpoint
+    on the request model. Streaming endpoints call load_session_context() and
+    persist_turn() directly.
     """
     def decorator(func):
         @wraps(func)
         async def wrapper(query_text: QueryText):
-            # Fetch history before execution
-            doc_ref = db.collection('chat_history').document(query_text.session_id)
-            doc = doc_ref.get()
-            if doc.exists:
-                query_text.history = doc.to_dict().get('history', [])
+            # Fetch history and approval pause before execution
+            await load_session_context(query_text)
 
             # Execute the original function
             result = await func(query_text)
 
-            # Clean up response if needed
-            if isinstance(result, dict) and "response" in result:
-                result["response"] = result["response"].replace(
-                    "<END_CONVERSATION>", ""
-                )
-
-            # Save playlist results if present
-            if isinstance(result, dict) and "playlist" in result and result["playlist"]:
-                playlist = result["playlist"]
-                playlist_doc_ref = db.collection('playlists').document(query_text.session_id)
-                playlist_doc_ref.set({'playlist': playlist}, merge=True)
-
-            # Handle pending approval state
-            if isinstance(result, dict) and result.get("awaiting_approval"):
-                # Save the pending state for later continuation
-                if "pending_state" in result:
-                    save_pending_state(query_text.session_id, result["pending_state"])
-            else:
-                # Clear any pending state on successful completion
-                clear_pending_state(query_text.session_id)
-
-            # Save updated history after execution
-            if isinstance(result, dict) and "state" in result:
-                doc_ref.set({
-                    'history': result["state"]
-                })
-
-            return result
+            # Returned as a response so the encoded state isn't re-encoded
+            return ORJSONResponse(persist_turn(query_text.session_id, result))
         return wrapper
     return decorator
 
 
+async def serve_from_mood_catalog(query_text: QueryText) -> Optional[Dict[str, Any]]:
+    """Answer a fresh session's opening query from the mood catalog, if cataloged."""
+    catalog = get_mood_catalog()
+    if catalog is None or query_text.history:
+        return None
+
+    catalog.record_query(query_text.query)
+    entry = await asyncio.to_thread(catalog.get, query_text.query)
+    if entry is None:
+        return None
+
+    logger.info(f"Serving '{query_text.query}' from the mood catalog")
+    schedule_refresh(query_text.query, entry["refreshed_at"])
+    state = entry["state"]
+    state["query"] = query_text.query
+    state["session_id"] = query_text.session_id
+    return {
+        "response": entry["response"],
+        "state": state,
+        "playlist": entry["playlist"],
+        "awaiting_approval": False
+    }
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
 @app.post("/query")
 @fetch_hist()
 async def handle_query(query_text: QueryText):
@@ -146,28 +214,35 @@ async def handle_query(query_text: QueryText):
         dict: Music recommendations and conversation results
     """
     try:
-        # Check if there's a pending approval for this session
-        pending_state = get_pending_state(query_text.session_id)
-
-        if pending_state:
+        # Check if a run is paused for approval in this session
+        if query_text._awaiting_approval:
             # Always resume agent with the user's reply
             # Let the approval_handler_node interpret the response using LLM
-            logger.info(f"Resuming from pending state for session {query_text.session_id}")
+            logger.info(f"Resuming from approval checkpoint for session {query_text.session_id}")
             logger.debug(f"User reply: {query_text.query}")
 
             result = await get_music_recommendations(
                 query=query_text.query,  # Pass user's reply for LLM interpretation
                 session_id=query_text.session_id,
                 history=query_text.history,
-                pending_state=pending_state
+                resume=True,
+                model_tiers=query_text.model_tiers,
+                formatter_mode=query_text.formatter_mode
             )
             return result
 
+        # A fresh session's opening query may already be in the mood catalog
+        cataloged = await serve_from_mood_catalog(query_text)
+        if cataloged is not None:
+            return cataloged
+
         # Normal flow - new query
         result = await get_music_recommendations(
             query=query_text.query,
             session_id=query_text.session_id,
-            history=query_text.history
+            history=query_text.history,
+            model_tiers=query_text.model_tiers,
+            formatter_mode=query_text.formatter_mode
         )
         return result
 
@@ -176,7 +251,89 @@ async def handle_query(query_text: QueryText):
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+@app.post("/query/stream")
+async def handle_query_stream(query_text: QueryText):
+    """
+    Streams a query's progress as server-sent events.
+
+    Emits plan, step_started, step_finished and token events while the
+    graph runs, then a done event with the response, playlist and approval
+    flag. The turn is persisted exactly as /query persists it.
+    """
+    await load_session_context(query_text)
+
+    async def events():
+        cataloged = None
+        if not query_text._awaiting_approval:
+            cataloged = await serve_from_mood_catalog(query_text)
+
+        if cataloged is not None:
+            result = cataloged
+            yield sse_event("token", {"text": result["response"]})
+        else:
+            result = None
+            try:
+                async for event, data in stream_music_recommendations(
+                    query=query_text.query,
+                    session_id=query_text.session_id,
+                    history=query_text.history,
+                    resume=query_text._awaiting_approval,
+                    model_tiers=query_text.model_tiers,
+                    formatter_mode=query_text.formatter_mode
+                ):
+                    if event == "done":
+                        result = data
+                    else:
+                        yield sse_event(event, data)
+            except Exception as e:
+                traceback.print_exc()
+                yield sse_event("error", {"detail": str(e)})
+                return
+
+            if result is None:
+                logger.error("Recommendation stream ended without a result")
+                yield sse_event("error", {"detail": "Recommendation stream ended without a result"})
+                return
+
+        result = persist_turn(query_text.session_id, result)
+        yield sse_event("done", {
+            "response": result["response"],
+            "playlist": result["playlist"],
+            "awaiting_approval": result["awaiting_approval"]
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Process-local cache and performance counters."""
+    catalog = get_track_catalog()
+    plan_cache = get_plan_cache()
+    mood_catalog = get_mood_catalog()
+    return {
+        "session_cache": get_session_cache().stats(),
+        "write_behind": get_session_store().writer.stats(),
+        "tools": get_tool_runtime().stats(),
+        "search_cache": get_search_cache().stats(),
+        "spotify_scheduler": get_spotify_scheduler().stats(),
+        "track_catalog": catalog.stats() if catalog else None,
+        "llm_tiers": get_llm_tracker().report(),
+        "llm_hedging": get_hedged_invoker().stats(),
+        "plan_cache": plan_cache.stats() if plan_cache else None,
+        "router": get_router_stats().stats(),
+        "speculation": get_speculation_registry().stats(),
+        "state_sizes": get_state_size_stats().stats(),
+        "track_table": get_track_table_cache().stats(),
+        "mood_catalog": mood_catalog.stats() if mood_catalog else None
+    }
@@ -1,46 +1,310 @@
 """
 LLM Config for LangChain/LangGraph models.
+
+Provider clients are built once per process and kept in a registry. The
+OpenAI and Groq clients share one tuned httpx connection pool, so every
+node reuses warm keep-alive connections instead of opening new ones.
+
+Each LLM-calling node is mapped to a model tier: the planner and replanner
+use the reasoning model, while approval classification and formatting use
+a fast model. Tiers can be overridden per environment (LLM_TIER_<NODE>)
+and per request. Calls are hedged to a backup provider when the primary
+is slow or failing (see llm_hedging.py).
 """
 import os
+import asyncio
+import logging
+import time
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 from langchain_groq import ChatGroq
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from config.llm_hedging import get_hedged_invoker
+from config.llm_metrics import get_llm_tracker
 
-def get_model_client():
-    """
-    Returns the appropriate LangChain chat model based on environment.
-    """
-    is_local = os.getenv('LOCAL', 'false').lower() == 'true'
+logger = logging.getLogger(__name__)
+
+# Endpoints used to open TLS connections ahead of the first request
+PREWARM_URLS = {
+    "openai": ("OPENAI_API_KEY", "https://api.openai.com/v1/models"),
+    "groq": ("GROQ_API_KEY", "https://api.groq.com/openai/v1/models"),
+}
+
+# Environment variable holding each provider's API key
+PROVIDER_API_KEYS = {
+    "openai": "OPENAI_API_KEY",
+    "groq": "GROQ_API_KEY",
+    "gemini": "GOOGLE_API_KEY",
+}
+
+REASONING_TIER = "reasoning"
+FAST_TIER = "fast"
+
+# Default model tier for each LLM-calling node
+NODE_MODEL_TIERS = {
+    "planner": REASONING_TIER,
+    "replanner": REASONING_TIER,
+    "approval_handler": FAST_TIER,
+    "format_assistant": FAST_TIER,
+}
+
+_clients: Dict[str, BaseChatModel] = {}
+_clients_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "120"))
+    )
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(float(os.getenv("LLM_HTTP_TIMEOUT", "120")), connect=10.0)
+
+
+def get_http_client() -> httpx.Client:
+    """Shared synchronous HTTP connection pool for LLM providers."""
+    global _http_client
+    with _clients_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_http_limits(), timeout=_http_timeout())
+        return _http_client
 
-    if is_local:
-        return get_gemini_client()
-    else:
-        return get_openai_client()
+
+def get_http_async_client() -> httpx.AsyncClient:
+    """Shared async HTTP connection pool for LLM providers."""
+    global _http_async_client
+    with _clients_lock:
+        if _http_async_client is None:
+            _http_async_client = httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout())
+        return _http_async_client
+
+
+def _get_or_create(name: str, factory: Callable[[], BaseChatModel]) -> BaseChatModel:
+    client = _clients.get(name)
+    if client is None:
+        client = factory()
+        with _clients_lock:
+            client = _clients.setdefault(name, client)
+    return client
 
 
 def get_openai_client():
     """Returns OpenAI client."""
-    return ChatOpenAI(
+    return _get_or_create("openai", lambda: ChatOpenAI(
         model="o3-mini",
         api_key=os.getenv("OPENAI_API_KEY"),
-        temperature=1  # o3-mini requires temperature=1
-    )
+        temperature=1,  # o3-mini requires temperature=1
+        http_client=get_http_client(),
+        http_async_client=get_http_async_client()
+    ))
 
 
 def get_groq_client():
     """Returns Groq client."""
-    return ChatGroq(
+    return _get_or_create("groq", lambda: ChatGroq(
         model="llama-3.3-70b-versatile",
         api_key=os.getenv("GROQ_API_KEY"),
-        temperature=0
-    )
+        temperature=0,
+        http_client=get_http_client(),
+        http_async_client=get_http_async_client()
+    ))
 
 
 def get_gemini_client():
     """Returns Gemini client."""
-    return ChatGoogleGenerativeAI(
+    return _get_or_create("gemini", lambda: ChatGoogleGenerativeAI(
         model="gemini-2.5-pro",
         google_api_key=os.getenv("GOOGLE_API_KEY"),
         temperature=0
+    ))
+
+
+PROVIDER_CLIENTS = {
+    "openai": get_openai_client,
+    "groq": get_groq_client,
+    "gemini": get_gemini_client,
+}
+
+
+def get_tier_provider(tier: str) -> str:
+    """
+    Provider that serves a model tier (LLM_REASONING_PROVIDER / LLM_FAST_PROVIDER).
+
+    The fast tier defaults to groq when GROQ_API_KEY is set, and to the
+    reasoning provider otherwise.
+    """
+    if tier == FAST_TIER:
+        fast = os.getenv("LLM_FAST_PROVIDER")
+        if fast:
+            return fast
+        return "groq" if has_credentials("groq") else get_tier_provider(REASONING_TIER)
+    is_local = os.getenv('LOCAL', 'false').lower() == 'true'
+    return os.getenv("LLM_REASONING_PROVIDER", "gemini" if is_local else "openai")
+
+
+def has_credentials(provider: str) -> bool:
+    """Whether the provider's API key is configured."""
+    return bool(os.getenv(PROVIDER_API_KEYS.get(provider, "")))
+
+
+def get_tier_backup_provider(tier: str) -> Optional[str]:
+    """
+    Provider used to hedge a tier's requests (LLM_<TIER>_BACKUP_PROVIDER).
+
+    Set the variable to "none" to disable hedging for the tier. Backups
+    without a configured API key are skipped.
+    """
+    primary = get_tier_provider(tier)
+    default = "openai" if primary != "openai" else "gemini"
+    backup = os.getenv(f"LLM_{tier.upper()}_BACKUP_PROVIDER", default).lower()
+    if backup == "none" or backup == primary or backup not in PROVIDER_CLIENTS:
+        return None
+    if not has_credentials(backup):
+        logger.debug(f"Not hedging {tier} tier to {backup}: {PROVIDER_API_KEYS[backup]} is not set")
+        return None
+    return backup
+
+
+def resolve_node_tier(node: str, overrides: Optional[Dict[str, str]] = None) -> str:
+    """
+    Pick the model tier for a node.
+
+    Precedence: per-request override, then LLM_TIER_<NODE>, then the default.
+    """
+    if overrides and overrides.get(node) in (REASONING_TIER, FAST_TIER):
+        return overrides[node]
+    env_tier = os.getenv(f"LLM_TIER_{node.upper()}")
+    if env_tier in (REASONING_TIER, FAST_TIER):
+        return env_tier
+    return NODE_MODEL_TIERS.get(node, REASONING_TIER)
+
+
+def get_model_for_node(node: str, overrides: Optional[Dict[str, str]] = None) -> BaseChatModel:
+    """Returns the chat model for a node's tier."""
+    tier = resolve_node_tier(node, overrides)
+    return PROVIDER_CLIENTS[get_tier_provider(tier)]()
+
+
+async def ainvoke_for_node(
+    node: str,
+    messages: List[Dict[str, Any]],
+    overrides: Optional[Dict[str, str]] = None
+):
+    """
+    Invoke the model for a node's tier, recording latency and token usage.
+
+    The request is hedged to the tier's backup provider if the primary is
+    slow, failing, or has its circuit open.
+
+    Args:
+        node: Name of the calling graph node (e.g. "planner")
+        messages: Chat messages to send
+        overrides: Optional per-request node -> tier overrides
+    """
+    tier = resolve_node_tier(node, overrides)
+    tracker = get_llm_tracker()
+
+    tracker.start(tier)
+    start = time.perf_counter()
+    response = None
+    try:
+        response = await get_hedged_invoker().ainvoke(
+            messages,
+            primary=get_tier_provider(tier),
+            backup=get_tier_backup_provider(tier),
+            get_client=lambda provider: PROVIDER_CLIENTS[provider]()
+        )
+        return response
+    finally:
+        tracker.finish(tier, node, (time.perf_counter() - start) * 1000, response)
+
+
+def can_stream_for_node(node: str, overrides: Optional[Dict[str, str]] = None) -> bool:
+    """Whether the primary provider for a node's tier is taking requests (its circuit isn't open)."""
+    return get_hedged_invoker().is_available(get_tier_provider(resolve_node_tier(node, overrides)))
+
+
+async def astream_for_node(
+    node: str,
+    messages: List[Dict[str, Any]],
+    overrides: Optional[Dict[str, str]] = None
+) -> AsyncIterator[str]:
+    """
+    Stream the text of a node's model response, recording latency and token usage.
+
+    The stream is hedged to the tier's backup provider if the primary sends
+    no first chunk within its hedge delay, and is bounded by
+    LLM_REQUEST_TIMEOUT_SECONDS. It counts towards the providers' latency
+    samples and circuit breakers like ainvoke_for_node does.
+    """
+    tier = resolve_node_tier(node, overrides)
+    tracker = get_llm_tracker()
+
+    tracker.start(tier)
+    start = time.perf_counter()
+    aggregate = None
+    stream = get_hedged_invoker().astream(
+        messages,
+        primary=get_tier_provider(tier),
+        backup=get_tier_backup_provider(tier),
+        get_client=lambda provider: PROVIDER_CLIENTS[provider]()
     )
+    try:
+        async for chunk in stream:
+            aggregate = chunk if aggregate is None else aggregate + chunk
+            if isinstance(chunk.content, str) and chunk.content:
+                yield chunk.content
+    finally:
+        await stream.aclose()
+        tracker.finish(tier, node, (time.perf_counter() - start) * 1000, aggregate)
+
+
+async def prewarm_clients() -> None:
+    """
+    Build the provider clients and open TLS connections to their APIs.
+
+    Enabled with LLM_PREWARM=true. Responses are ignored; the point is to
+    leave established connections in the shared pool.
+    """
+    if os.getenv("LLM_PREWARM", "false").lower() != "true":
+        return
+
+    for tier in (REASONING_TIER, FAST_TIER):
+        PROVIDER_CLIENTS[get_tier_provider(tier)]()
+    http = get_http_async_client()
+
+    async def warm(provider: str, url: str) -> None:
+        try:
+            await http.get(url)
+            logger.info(f"Pre-warmed connection to {provider}")
+        except Exception as e:
+            logger.warning(f"Could not pre-warm {provider}: {e}")
+
+    await asyncio.gather(*(
+        warm(provider, url)
+        for provider, (key_var, url) in PREWARM_URLS.items()
+        if os.getenv(key_var)
+    ))
+
+
+async def close_clients() -> None:
+    """Close the shared HTTP connection pools."""
+    global _http_client, _http_async_client
+    with _clients_lock:
+        http, http_async = _http_client, _http_async_client
+        _http_client = _http_async_client = None
+        _clients.clear()
+    if http_async is not None:
+        await http_async.aclose()
+    if http is not None:
+        http.close()
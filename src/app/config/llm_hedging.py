@@ -0,0 +1,396 @@
+"""
+Hedged LLM requests with cross-provider fallback.
+
+A call goes to the tier's primary provider. If no valid response arrives
+within the hedge delay (a latency percentile of that provider's recent
+calls), the same messages are sent to a backup provider; the first valid
+response wins and the other request is cancelled. Streams are hedged the
+same way on their first chunk. A per-provider circuit breaker stops
+routing to providers that keep failing until a cooldown has passed.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a half-open trial after the cooldown."""
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """Whether a request may be sent to this provider."""
+        if self.opened_at is None:
+            return True
+        return time.monotonic() - self.opened_at >= self.cooldown
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.trips += 1
+            # A failed half-open trial restarts the cooldown
+            self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.allow() else "open"
+
+
+class HedgedInvoker:
+    """Sends LLM calls with latency-based hedging and circuit breaking."""
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        default_delay: float = 8.0,
+        min_delay: float = 0.5,
+        min_samples: int = 20,
+        timeout: float = 90.0,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0
+    ):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.timeout = timeout
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+        self.hedges = 0
+        self.backup_wins = 0
+        self.failovers = 0
+        self.timeouts = 0
+
+    def _breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self._breakers:
+            self._breakers[provider] = CircuitBreaker(self._failure_threshold, self._cooldown)
+        return self._breakers[provider]
+
+    def hedge_delay(self, provider: str) -> float:
+        """Seconds to wait on a provider before firing the backup request."""
+        with self._lock:
+            samples = sorted(self._latencies.get(provider, ()))
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        index = min(len(samples) - 1, int(len(samples) * self.percentile))
+        return max(self.min_delay, samples[index])
+
+    def _record(self, provider: str, elapsed: Optional[float], ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._latencies.setdefault(provider, deque(maxlen=200)).append(elapsed)
+                self._breaker(provider).record_success()
+            else:
+                breaker = self._breaker(provider)
+                was_open = breaker.opened_at is not None
+                breaker.record_failure()
+                if breaker.opened_at is not None and not was_open:
+                    logger.warning(f"Circuit opened for LLM provider {provider}")
+
+    def is_available(self, provider: str) -> bool:
+        """Whether a provider's circuit currently lets requests through."""
+        with self._lock:
+            return self._breaker(provider).allow()
+
+    def _order(self, primary: str, backup: Optional[str]) -> List[str]:
+        """Providers to try, with tripped ones moved to the back."""
+        providers = [primary] + ([backup] if backup and backup != primary else [])
+        with self._lock:
+            healthy = [p for p in providers if self._breaker(p).allow()]
+        if healthy and healthy[0] != primary:
+            with self._lock:
+                self.failovers += 1
+        # If every breaker is open, still try the primary rather than fail outright
+        return healthy or providers[:1]
+
+    async def _call(
+        self,
+        provider: str,
+        get_client: Callable[[str], BaseChatModel],
+        messages: List[Dict[str, Any]]
+    ):
+        start = time.monotonic()
+        try:
+            # Built inside the task so a client that can't be constructed
+            # fails only this provider's request
+            model = get_client(provider)
+            response = await model.ainvoke(messages)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"LLM call to {provider} failed: {e}")
+            self._record(provider, None, ok=False)
+            raise
+        if not getattr(response, "content", None):
+            self._record(provider, None, ok=False)
+            raise ValueError(f"Empty response from {provider}")
+        self._record(provider, time.monotonic() - start, ok=True)
+        return response
+
+    async def ainvoke(
+        self,
+        messages: List[Dict[str, Any]],
+        primary: str,
+        backup: Optional[str],
+        get_client: Callable[[str], BaseChatModel]
+    ):
+        """
+        Invoke the primary provider, hedging to the backup when it is slow or fails.
+
+        Args:
+            messages: Chat messages to send
+            primary: Provider name for the tier
+            backup: Provider to hedge to, or None to disable hedging
+            get_client: Maps a provider name to its chat model
+        """
+        try:
+            return await asyncio.wait_for(
+                self._race(messages, self._order(primary, backup), get_client),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    async def _race(self, messages, providers: List[str], get_client):
+        pending: Dict[asyncio.Task, str] = {}
+        queue = list(providers)
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            provider = queue.pop(0)
+            task = asyncio.create_task(self._call(provider, get_client, messages))
+            pending[task] = provider
+
+        launch()
+        try:
+            while pending:
+                delay = self.hedge_delay(providers[0]) if queue else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Primary is slower than its usual tail: fire the backup
+                    with self._lock:
+                        self.hedges += 1
+                    logger.info(f"Hedging LLM request to {queue[0]}")
+                    launch()
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        if provider != providers[0]:
+                            with self._lock:
+                                self.backup_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+
+                if not pending and queue:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error
+
+    async def _open_stream(
+        self,
+        provider: str,
+        get_client: Callable[[str], BaseChatModel],
+        messages: List[Dict[str, Any]]
+    ) -> Tuple[Any, Any, float]:
+        """Start a provider's stream and wait for its first chunk."""
+        start = time.monotonic()
+        stream = None
+        try:
+            stream = get_client(provider).astream(messages).__aiter__()
+            chunk = await stream.__anext__()
+        except asyncio.CancelledError:
+            await _aclose(stream)
+            raise
+        except StopAsyncIteration:
+            await _aclose(stream)
+            self._record(provider, None, ok=False)
+            raise ValueError(f"Empty response from {provider}")
+        except Exception as e:
+            logger.warning(f"LLM stream from {provider} failed: {e}")
+            await _aclose(stream)
+            self._record(provider, None, ok=False)
+            raise
+        return stream, chunk, start
+
+    async def _race_first_chunk(self, messages, providers: List[str], get_client, deadline: float):
+        """Open streams until one yields a chunk, hedging like _race does for whole responses."""
+        pending: Dict[asyncio.Task, str] = {}
+        queue = list(providers)
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            provider = queue.pop(0)
+            task = asyncio.create_task(self._open_stream(provider, get_client, messages))
+            pending[task] = provider
+
+        launch()
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._lock:
+                        self.timeouts += 1
+                    for provider in pending.values():
+                        self._record(provider, None, ok=False)
+                    raise asyncio.TimeoutError()
+                delay = min(self.hedge_delay(providers[0]), remaining) if queue else remaining
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if queue:
+                        # No first chunk within the primary's usual latency: start the backup stream
+                        with self._lock:
+                            self.hedges += 1
+                        logger.info(f"Hedging LLM stream to {queue[0]}")
+                        launch()
+                    continue
+
+                winner = None
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                    elif winner is None:
+                        winner = (provider, *task.result())
+                    else:
+                        await _aclose(task.result()[0])
+                if winner is not None:
+                    if winner[0] != providers[0]:
+                        with self._lock:
+                            self.backup_wins += 1
+                    return winner
+
+                if not pending and queue:
+                    launch()
+        finally:
+            for task in pending:
+                # A stream that opened after the race was decided still needs closing
+                if not task.cancel() and task.exception() is None:
+                    await _aclose(task.result()[0])
+
+        raise last_error
+
+    async def astream(
+        self,
+        messages: List[Dict[str, Any]],
+        primary: str,
+        backup: Optional[str],
+        get_client: Callable[[str], BaseChatModel]
+    ) -> AsyncIterator[Any]:
+        """
+        Stream the primary provider's response chunks, hedging to the backup.
+
+        The backup stream starts if the primary sends no first chunk within
+        its hedge delay; the first stream to produce a chunk is kept and the
+        other is cancelled. The whole stream is bounded by timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        provider, stream, chunk, start = await self._race_first_chunk(
+            messages, self._order(primary, backup), get_client, deadline
+        )
+        received = False
+        try:
+            while True:
+                received = received or bool(chunk.content)
+                yield chunk
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline - time.monotonic(), 0))
+                except StopAsyncIteration:
+                    break
+            if not received:
+                raise ValueError(f"Empty response from {provider}")
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            self._record(provider, None, ok=False)
+            raise
+        except Exception as e:
+            logger.warning(f"LLM stream from {provider} failed: {e}")
+            self._record(provider, None, ok=False)
+            raise
+        finally:
+            await _aclose(stream)
+        self._record(provider, time.monotonic() - start, ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report hedging counters and breaker states per provider."""
+        with self._lock:
+            providers = set(self._breakers) | set(self._latencies)
+            breakers = {
+                provider: {
+                    "state": self._breaker(provider).state,
+                    "failures": self._breaker(provider).failures,
+                    "trips": self._breaker(provider).trips,
+                }
+                for provider in providers
+            }
+            counters = {
+                "hedges": self.hedges,
+                "backup_wins": self.backup_wins,
+                "failovers": self.failovers,
+                "timeouts": self.timeouts,
+            }
+        return {
+            **counters,
+            "hedge_delay": {provider: self.hedge_delay(provider) for provider in providers},
+            "providers": breakers,
+        }
+
+
+async def _aclose(stream: Any) -> None:
+    if stream is not None and hasattr(stream, "aclose"):
+        await stream.aclose()
+
+
+_invoker: Optional[HedgedInvoker] = None
+_invoker_lock = threading.Lock()
+
+
+def get_hedged_invoker() -> HedgedInvoker:
+    """Get the process-wide hedged LLM invoker."""
+    global _invoker
+    if _invoker is None:
+        with _invoker_lock:
+            if _invoker is None:
+                _invoker = HedgedInvoker(
+                    percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+                    default_delay=float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "8")),
+                    timeout=float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "90")),
+                    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                    cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+                )
+    return _invoker
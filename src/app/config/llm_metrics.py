@@ -0,0 +1,91 @@
+"""
+Latency and token accounting for LLM calls, grouped by model tier.
+"""
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class TierStats:
+    """Counters for the calls made on one model tier."""
+
+    def __init__(self, window: int = 256):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_ms = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.nodes: Dict[str, int] = {}
+        self._recent = deque(maxlen=window)
+
+    def percentile(self, pct: float) -> float:
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "avg_ms": self.total_ms / self.calls if self.calls else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "calls_by_node": dict(self.nodes),
+        }
+
+
+class LLMUsageTracker:
+    """Thread-safe per-tier latency and token report."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers: Dict[str, TierStats] = {}
+
+    def _tier(self, tier: str) -> TierStats:
+        if tier not in self._tiers:
+            self._tiers[tier] = TierStats()
+        return self._tiers[tier]
+
+    def start(self, tier: str) -> None:
+        """Mark a call as in flight."""
+        with self._lock:
+            self._tier(tier).in_flight += 1
+
+    def finish(self, tier: str, node: str, elapsed_ms: float, response: Optional[Any] = None) -> None:
+        """Record a finished call; a None response counts as an error."""
+        with self._lock:
+            stats = self._tier(tier)
+            stats.in_flight -= 1
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats._recent.append(elapsed_ms)
+            stats.nodes[node] = stats.nodes.get(node, 0) + 1
+            if response is None:
+                stats.errors += 1
+                return
+            usage = getattr(response, "usage_metadata", None) or {}
+            stats.input_tokens += usage.get("input_tokens", 0)
+            stats.output_tokens += usage.get("output_tokens", 0)
+
+    def in_flight(self) -> int:
+        """Total LLM calls currently in flight across tiers."""
+        with self._lock:
+            return sum(stats.in_flight for stats in self._tiers.values())
+
+    def report(self) -> Dict[str, Any]:
+        """Per-tier latency and token report."""
+        with self._lock:
+            return {tier: stats.as_dict() for tier, stats in self._tiers.items()}
+
+
+_tracker = LLMUsageTracker()
+
+
+def get_llm_tracker() -> LLMUsageTracker:
+    """Get the process-wide LLM usage tracker."""
+    return _tracker
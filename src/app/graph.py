@@ -2,14 +2,24 @@
 LangGraph workflow definition for the Planning Agent.
 
 Architecture:
-START -> planner -> executor (loop) -> format_assistant -> END
+START -> router -> [planner] -> executor (loop) -> format_assistant -> END
                       |
               [replanner if needed]
                       |
-              [approval pause if saving to Spotify]
+              [approval_handler interrupt if saving to Spotify]
+
+The graph is compiled with the checkpointer from storage/checkpointer.py;
+approval pauses are interrupts that the next turn resumes by thread_id.
 """
+import asyncio
+from typing import Optional
+
 from langgraph.graph import StateGraph, START, END
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from state import PlanningAgentState
+from storage.checkpointer import get_checkpointer
+from nodes.router import router_node
 from nodes.planner import planner_node
 from nodes.executor import executor_node, approval_handler_node
 from nodes.replanner import replanner_node
@@ -22,7 +32,7 @@ def should_continue(state: PlanningAgentState) -> str:
 
     Routing logic:
     - If error -> format (to show error message)
-    - If awaiting approval -> END (pause for user input)
+    - If awaiting approval -> approval_handler (pause for user input)
     - If needs replan -> replanner
     - If execution complete -> format
     - Otherwise -> executor (continue executing steps)
@@ -33,7 +43,7 @@ def should_continue(state: PlanningAgentState) -> str:
 
     # Check if we're waiting for user approval
     if state.get("awaiting_approval"):
-        return END
+        return "approval_handler"
 
     # Check if replanning is needed
     if state.get("needs_replan"):
@@ -58,18 +68,31 @@ def should_continue(state: PlanningAgentState) -> str:
     return "executor"
 
 
+def route_after_router(state: PlanningAgentState) -> str:
+    """
+    Route after router node.
+
+    A routed plan goes straight to the executor; everything else
+    goes to the LLM planner.
+    """
+    if state.get("plan"):
+        return "executor"
+
+    return "planner"
+
+
 def route_after_planner(state: PlanningAgentState) -> str:
     """
     Route after planner node.
 
     If planner set awaiting_approval (for save_playlist_to_spotify),
-    go directly to END to pause for user input.
+    go directly to the approval handler to pause for user input.
     """
     if state.get("error"):
         return "format_assistant"
 
     if state.get("awaiting_approval"):
-        return END
+        return "approval_handler"
 
     # Start execution
     return "executor"
@@ -86,107 +109,78 @@ def route_after_replanner(state: PlanningAgentState) -> str:
     return "executor"
 
 
-def build_planning_agent_graph():
+def build_planning_agent_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
     """
     Builds the LangGraph workflow for the Planning Agent.
 
     Graph structure:
-    START -> planner -> executor (loop) -> format_assistant -> END
+    START -> router -> [planner] -> executor (loop) -> format_assistant -> END
                            |
                    [replanner on failure]
                            |
-                   [END on approval needed - pause]
+                   [approval_handler on approval needed - interrupt]
+
+    Args:
+        checkpointer: Where paused runs are kept; required for approval pauses
     """
     workflow = StateGraph(PlanningAgentState)
 
     # Add nodes
+    workflow.add_node("router", router_node)
     workflow.add_node("planner", planner_node)
     workflow.add_node("executor", executor_node)
+    workflow.add_node("approval_handler", approval_handler_node)
     workflow.add_node("replanner", replanner_node)
     workflow.add_node("format_assistant", format_assistant_node)
 
-    # Start with planner
-    workflow.add_edge(START, "planner")
-
-    # After planner, route based on state
-    workflow.add_conditional_edges(
-        "planner",
-        route_after_planner,
-        {
-            "executor": "executor",
-            "format_assistant": "format_assistant",
-            END: END
-        }
-    )
+    # Start with the router; simple memory intents skip the planner
+    workflow.add_edge(START, "router")
 
-    # After executor, check what to do next
     workflow.add_conditional_edges(
-        "executor",
-        should_continue,
+        "router",
+        route_after_router,
         {
             "executor": "executor",
-            "replanner": "replanner",
-            "format_assistant": "format_assistant",
-            END: END
+            "planner": "planner"
         }
     )
 
-    # After replanner, start executing the new plan
+    # After planner, route based on state
     workflow.add_conditional_edges(
-        "replanner",
-        route_after_replanner,
+        "planner",
+        route_after_planner,
         {
             "executor": "executor",
+            "approval_handler": "approval_handler",
             "format_assistant": "format_assistant"
         }
     )
 
-    # Format assistant always ends
-    workflow.add_edge("format_assistant", END)
-
-    return workflow.compile()
-
-
-def build_approval_continuation_graph():
-    """
-    Builds a graph for continuing after approval.
-
-    This is used when resuming from an approval pause.
-    START -> approval_handler -> executor (loop) -> format_assistant -> END
-    """
-    workflow = StateGraph(PlanningAgentState)
-
-    workflow.add_node("approval_handler", approval_handler_node)
-    workflow.add_node("executor", executor_node)
-    workflow.add_node("replanner", replanner_node)
-    workflow.add_node("format_assistant", format_assistant_node)
-
-    workflow.add_edge(START, "approval_handler")
-
-    # After approval handler, either continue or end
+    # After executor, check what to do next
     workflow.add_conditional_edges(
-        "approval_handler",
+        "executor",
         should_continue,
         {
             "executor": "executor",
+            "approval_handler": "approval_handler",
             "replanner": "replanner",
-            "format_assistant": "format_assistant",
-            END: END
+            "format_assistant": "format_assistant"
         }
     )
 
-    # Executor routing (same as main graph)
+    # After the user's reply: continue, ask again or finish
     workflow.add_conditional_edges(
-        "executor",
+        "approval_handler",
         should_continue,
         {
             "executor": "executor",
+            "approval_handler": "approval_handler",
             "replanner": "replanner",
-            "format_assistant": "format_assistant",
-            END: END
+            "format_assistant": "format_assistant"
         }
     )
 
+    # After replanner, start executing the new plan
     workflow.add_conditional_edges(
         "replanner",
         route_after_replanner,
@@ -196,21 +190,22 @@ def build_approval_continuation_graph():
         }
     )
 
+    # Format assistant always ends
     workflow.add_edge("format_assistant", END)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
 
-# Compile the main graph
-_graph = build_planning_agent_graph()
-_approval_graph = build_approval_continuation_graph()
+# Compiled once the checkpointer is open
+_graph: Optional[CompiledStateGraph] = None
+_graph_lock = asyncio.Lock()
 
 
-def get_graph():
-    """Get the main planning agent graph."""
+async def get_graph() -> CompiledStateGraph:
+    """Get the main planning agent graph, compiled with the checkpointer."""
+    global _graph
+    if _graph is None:
+        async with _graph_lock:
+            if _graph is None:
+                _graph = build_planning_agent_graph(await get_checkpointer())
     return _graph
-
-
-def get_approval_graph():
-    """Get the approval continuation graph."""
-    return _approval_graph
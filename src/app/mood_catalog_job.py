@@ -0,0 +1,138 @@
+"""
+Batch job that precomputes answers for the mood catalog.
+
+The suggestion chips plus the MOOD_CATALOG_TOP_N most frequent opening
+queries are run through the planning graph and the results stored in
+storage/mood_catalog.py. The app runs the job on startup and then every
+MOOD_CATALOG_REFRESH_SECONDS; it can also be run on its own:
+
+    python mood_catalog_job.py
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import List, Set
+
+from agent import discard_thread, get_music_recommendations
+from storage.checkpointer import close_checkpointer
+from storage.mood_catalog import SUGGESTION_CHIPS, get_mood_catalog, normalize_intent
+
+logger = logging.getLogger(__name__)
+
+# Session the job's graph runs belong to; it has no history or saved playlists.
+# Every refresh runs on its own checkpoint thread, so refreshes can overlap and
+# never pick up state from an earlier run.
+CATALOG_SESSION_ID = "mood-catalog"
+
+_refreshing: Set[str] = set()
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def catalog_intents() -> List[str]:
+    """
+    Suggestion chips followed by the most frequent opening queries.
+
+    Flushes the in-memory query counts first. Blocks on SQLite.
+    """
+    catalog = get_mood_catalog()
+    top_n = int(os.getenv("MOOD_CATALOG_TOP_N", "20"))
+    top = []
+    if catalog is not None:
+        catalog.flush_counts()
+        top = catalog.top_intents(top_n)
+    intents, seen = [], set()
+    for query in SUGGESTION_CHIPS + top:
+        key = normalize_intent(query)
+        if key and key not in seen:
+            seen.add(key)
+            intents.append(query)
+    return intents
+
+
+async def refresh_intent(query: str) -> bool:
+    """Run one intent through the graph and store the result. Returns True if stored."""
+    catalog = get_mood_catalog()
+    if catalog is None:
+        return False
+
+    thread_id = f"{CATALOG_SESSION_ID}:{normalize_intent(query)}:{uuid.uuid4().hex}"
+    result = await get_music_recommendations(
+        query=query,
+        session_id=CATALOG_SESSION_ID,
+        thread_id=thread_id
+    )
+    if result.get("awaiting_approval"):
+        # Nobody will answer the approval prompt
+        await discard_thread(thread_id)
+
+    # Only complete, track-bearing answers are worth serving to other sessions
+    if result.get("awaiting_approval") or not result.get("playlist") or not result.get("state"):
+        logger.info(f"Not cataloging '{query}': no usable result")
+        return False
+    if result["state"].get("error"):
+        logger.info(f"Not cataloging '{query}': {result['state']['error']}")
+        return False
+
+    await asyncio.to_thread(catalog.put, query, result["response"], result["playlist"], result["state"])
+    return True
+
+
+async def refresh_catalog() -> int:
+    """Refresh every catalog intent, one at a time. Returns how many were stored."""
+    stored = 0
+    for query in await asyncio.to_thread(catalog_intents):
+        try:
+            if await refresh_intent(query):
+                stored += 1
+        except Exception as e:
+            logger.warning(f"Could not refresh catalog intent '{query}': {e}")
+    logger.info(f"Mood catalog refreshed: {stored} intents stored")
+    return stored
+
+
+async def run_periodically(interval: float) -> None:
+    """Refresh the catalog now and then every `interval` seconds."""
+    while True:
+        await refresh_catalog()
+        await asyncio.sleep(interval)
+
+
+def schedule_refresh(query: str, refreshed_at: float) -> None:
+    """
+    Refresh one intent in the background after it was served from the catalog.
+
+    Skipped when the entry is younger than MOOD_CATALOG_MIN_AGE_SECONDS or a
+    refresh for the same intent is already running.
+    """
+    min_age = float(os.getenv("MOOD_CATALOG_MIN_AGE_SECONDS", "300"))
+    key = normalize_intent(query)
+    if time.time() - refreshed_at < min_age or key in _refreshing:
+        return
+
+    async def refresh() -> None:
+        try:
+            await refresh_intent(query)
+        except Exception as e:
+            logger.warning(f"Background refresh of '{query}' failed: {e}")
+        finally:
+            _refreshing.discard(key)
+
+    _refreshing.add(key)
+    task = asyncio.create_task(refresh())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+if __name__ == "__main__":
+    import app  # noqa: F401  initializes Firebase
+
+    async def main() -> None:
+        try:
+            await refresh_catalog()
+        finally:
+            await close_checkpointer()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,12 +1,14 @@
 """
 Node functions for the Planning Agent workflow.
 """
+from nodes.router import router_node
 from nodes.planner import planner_node
 from nodes.executor import executor_node, approval_handler_node
 from nodes.replanner import replanner_node
 from nodes.format_assistant import format_assistant_node
 
 __all__ = [
+    "router_node",
     "planner_node",
     "executor_node",
     "approval_handler_node",
@@ -1,32 +1,62 @@
 """
 Executor node for the Planning Agent workflow.
 
-The executor runs the plan steps one by one, invoking the appropriate tools
-and tracking results. It handles approval pauses for sensitive operations.
+The executor schedules plan steps by their RESULT_STEP_N dependencies,
+running independent steps concurrently and tracking results. It handles
+approval pauses for sensitive operations. Step starts and finishes are
+dispatched as custom events for streaming clients.
 """
+import asyncio
 import logging
-from typing import Dict, Any, List
+import os
+from typing import Dict, Any, List, Optional, Set
+
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langgraph.types import interrupt
 
 from state import PlanningAgentState
 from tools.planning_tools import TOOL_REGISTRY
-from config.llm_config import get_model_client
+from tools.runtime import get_tool_runtime
+from config.llm_config import ainvoke_for_node
 from tools.llm_tools import extract_json_from_llm_response
+from storage.track_store import TrackTable, intern_result, intern_args, resolve_tracks, result_tracks, result_uris
+from nodes.speculation import get_speculation_registry
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of plan steps executing at once
+MAX_PARALLEL_STEPS = int(os.getenv("EXECUTOR_MAX_CONCURRENCY", "4"))
+
+# Tools whose side effects must keep plan order relative to each other
+ORDERED_TOOLS = {
+    "commit_playlist_to_memory",
+    "read_playlist_from_memory",
+    "save_playlist_to_spotify",
+}
 
-def resolve_args(args: Dict[str, Any], step_results: Dict[str, Any], state: PlanningAgentState) -> Dict[str, Any]:
+
+def resolve_args(
+    args: Dict[str, Any],
+    step_results: Dict[str, Any],
+    state: PlanningAgentState,
+    tracks: Optional[TrackTable] = None
+) -> Dict[str, Any]:
     """
     Resolve argument placeholders with actual values.
 
     Handles:
-    - RESULT_STEP_N: Replace with result from step N
+    - RESULT_STEP_N: Replace with result from step N; track results are
+      resolved from URIs against the track table (state's, unless given)
+    - track_uris: Passed to the tool as the resolved `tracks` list
     - Session ID injection for memory operations
     """
+    table = tracks if tracks is not None else state.get("tracks") or {}
     resolved = {}
 
     for key, value in args.items():
-        if isinstance(value, str):
+        if key == "track_uris" and isinstance(value, list):
+            resolved["tracks"] = resolve_tracks(value, table)
+        elif isinstance(value, str):
             # Handle step result references
             if value.startswith("RESULT_STEP_"):
                 step_num = value.replace("RESULT_STEP_", "")
@@ -34,8 +64,8 @@ def resolve_args(args: Dict[str, Any], step_results: Dict[str, Any], state: Plan
                 if result_key in step_results:
                     step_result = step_results[result_key]
                     # Extract tracks from the result if it's a search result
-                    if isinstance(step_result, dict) and "tracks" in step_result:
-                        resolved[key] = step_result["tracks"]
+                    if isinstance(step_result, dict) and ("track_uris" in step_result or "tracks" in step_result):
+                        resolved[key] = result_tracks(step_result, table)
                     else:
                         resolved[key] = step_result
                 else:
@@ -53,131 +83,256 @@ def resolve_args(args: Dict[str, Any], step_results: Dict[str, Any], state: Plan
     return resolved
 
 
-def get_tracks_from_results(step_results: Dict[str, Any]) -> List[Dict]:
-    """Extract all tracks from step results."""
-    all_tracks = []
-
-    for key, result in step_results.items():
-        if isinstance(result, dict) and "tracks" in result:
-            tracks = result["tracks"]
-            if isinstance(tracks, list):
-                all_tracks.extend(tracks)
-
-    # Remove duplicates by URI
-    seen_uris = set()
-    unique_tracks = []
-    for track in all_tracks:
-        uri = track.get("uri", "")
-        if uri and uri not in seen_uris:
-            seen_uris.add(uri)
-            unique_tracks.append(track)
-
-    return unique_tracks
+def get_step_dependencies(plan: List[Dict[str, Any]]) -> Dict[int, Set[int]]:
+    """
+    Derive the dependencies of each plan step.
 
+    A step depends on every earlier step it references through a
+    RESULT_STEP_N placeholder. Memory and Spotify writes/reads also keep
+    their plan order relative to each other, since e.g. reading a playlist
+    by name must see an earlier commit of that name.
 
-async def executor_node(state: PlanningAgentState) -> Dict[str, Any]:
+    Returns:
+        Mapping of step index to the set of step indices it waits on
     """
-    Execute the current step in the plan.
+    dependencies = {}
+    last_ordered = None
 
-    The executor:
-    1. Gets the current step from the plan
-    2. Resolves argument placeholders
-    3. Checks for approval requirements
-    4. Invokes the tool
-    5. Stores the result and advances to the next step
-    """
-    plan = state.get("plan", [])
-    current_step = state.get("current_step", 0)
-    step_results = state.get("step_results", {}).copy()
+    for index, step in enumerate(plan):
+        step_deps = set()
+        for value in step.get("args", {}).values():
+            if isinstance(value, str) and value.startswith("RESULT_STEP_"):
+                try:
+                    dep = int(value.replace("RESULT_STEP_", "")) - 1
+                except ValueError:
+                    continue
+                if 0 <= dep < index:
+                    step_deps.add(dep)
 
-    # Check if we've completed all steps
-    if current_step >= len(plan):
-        logger.info("Execution complete - all steps finished")
-        return {
-            "execution_complete": True,
-            "step_results": step_results
-        }
-
-    step = plan[current_step]
-    tool_name = step.get("tool", "")
-    raw_args = step.get("args", {})
+        if step.get("tool") in ORDERED_TOOLS:
+            if last_ordered is not None:
+                step_deps.add(last_ordered)
+            last_ordered = index
 
-    logger.info(f"Executing step {current_step + 1}/{len(plan)}: {tool_name}")
+        dependencies[index] = step_deps
 
-    # Resolve argument placeholders
-    resolved_args = resolve_args(raw_args, step_results, state)
+    return dependencies
 
-    # Check for approval requirement BEFORE execution
-    if tool_name == "save_playlist_to_spotify":
-        if not state.get("user_approved"):
-            # Need to pause for approval
-            track_count = len(resolved_args.get("tracks", []))
-            playlist_name = resolved_args.get("playlist_name", "playlist")
 
-            logger.info(f"Pausing for approval: {playlist_name} with {track_count} tracks")
+async def emit_step_event(name: str, data: Dict[str, Any]) -> None:
+    """Dispatch a step event to astream_events consumers, if any."""
+    try:
+        await adispatch_custom_event(name, data)
+    except RuntimeError:
+        # Not running inside a graph run (no parent run to attach to)
+        pass
+
+
+def build_approval_pause(step_index: int, tool_name: str, resolved_args: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the state update that pauses execution for user approval."""
+    track_count = len(resolved_args.get("tracks", []))
+    playlist_name = resolved_args.get("playlist_name", "playlist")
+
+    logger.info(f"Pausing for approval: {playlist_name} with {track_count} tracks")
+
+    return {
+        "awaiting_approval": True,
+        "pending_action": {
+            "tool": tool_name,
+            "args": intern_args(resolved_args),  # Tracks by URI; the table holds the dicts
+            "step_index": step_index,
+            "description": f"Create '{playlist_name}' ({track_count} tracks) on your Spotify"
+        },
+        "formatted_response": f"I'm ready to create '{playlist_name}' with {track_count} tracks on your Spotify account. Want me to go ahead?"
+    }
+
+
+async def run_step(
+    step_index: int,
+    step: Dict[str, Any],
+    step_results: Dict[str, Any],
+    state: PlanningAgentState,
+    semaphore: asyncio.Semaphore,
+    tracks: TrackTable
+) -> Dict[str, Any]:
+    """
+    Resolve arguments for a single plan step and invoke its tool.
 
-            return {
-                "awaiting_approval": True,
-                "pending_action": {
-                    "tool": tool_name,
-                    "args": resolved_args,
-                    "step_index": current_step,
-                    "description": f"Create '{playlist_name}' ({track_count} tracks) on your Spotify"
-                },
-                "formatted_response": f"I'm ready to create '{playlist_name}' with {track_count} tracks on your Spotify account. Want me to go ahead?"
-            }
+    Returns:
+        {"result": ..., "tracks": {...}} on success, with the result's track
+        list replaced by URIs and the new track table entries alongside; or
+        {"failure": {...}} holding the state update that reports the failure
+    """
+    tool_name = step.get("tool", "")
+    step_number = step_index + 1
 
     # Get the tool from registry
     tool = TOOL_REGISTRY.get(tool_name)
 
     if not tool:
         logger.error(f"Unknown tool: {tool_name}")
-        return {
+        return {"failure": {
             "error": f"Unknown tool: {tool_name}",
             "needs_replan": True,
             "replan_reason": f"Tool '{tool_name}' not found"
-        }
+        }}
+
+    # Resolve argument placeholders
+    resolved_args = resolve_args(step.get("args", {}), step_results, state, tracks)
 
     # Execute the tool
     try:
-        # Filter args to only include what the tool accepts
-        # (remove session_id for tools that don't need it)
-        tool_args = resolved_args.copy()
-
-        result = tool.invoke(tool_args)
-
-        logger.info(f"Step {current_step + 1} result: success={result.get('success', False)}")
+        speculative = get_speculation_registry().claim(state.get("speculation_id"), step)
+        if speculative is not None:
+            # Started while the planner was still writing the plan
+            logger.info(f"Executing step {step_number}: {tool_name} (speculative)")
+            await emit_step_event("step_started", {"step": step_number, "tool": tool_name})
+            result = await speculative
+        else:
+            async with semaphore:
+                logger.info(f"Executing step {step_number}: {tool_name}")
+                await emit_step_event("step_started", {"step": step_number, "tool": tool_name})
+                result = await get_tool_runtime().ainvoke(tool_name, tool, resolved_args)
+
+        logger.info(f"Step {step_number} result: success={result.get('success', False)}")
+        await emit_step_event("step_finished", {
+            "step": step_number,
+            "tool": tool_name,
+            "success": result.get("success", True) if isinstance(result, dict) else True,
+            "tracks": result.get("tracks", []) if isinstance(result, dict) else []
+        })
 
         # Check for tool failure
         if isinstance(result, dict) and not result.get("success", True):
             error_msg = result.get("error", "Tool execution failed")
             logger.warning(f"Tool {tool_name} failed: {error_msg}")
 
-            return {
-                "step_results": step_results,
+            return {"failure": {
                 "last_tool_result": result,
                 "needs_replan": True,
-                "replan_reason": f"Step {current_step + 1} ({tool_name}) failed: {error_msg}"
-            }
+                "replan_reason": f"Step {step_number} ({tool_name}) failed: {error_msg}"
+            }}
 
-        # Store the result
-        step_results[f"step_{current_step + 1}"] = result
-
-        # Advance to next step
-        return {
-            "step_results": step_results,
-            "last_tool_result": result,
-            "current_step": current_step + 1
-        }
+        result, new_tracks = intern_result(result)
+        return {"result": result, "tracks": new_tracks}
 
     except Exception as e:
         logger.error(f"Error executing {tool_name}: {e}")
+        await emit_step_event("step_finished", {
+            "step": step_number,
+            "tool": tool_name,
+            "success": False,
+            "tracks": []
+        })
+        return {"failure": {
+            "needs_replan": True,
+            "replan_reason": f"Step {step_number} ({tool_name}) error: {str(e)}"
+        }}
+
+
+async def executor_node(state: PlanningAgentState) -> Dict[str, Any]:
+    """
+    Execute every runnable step in the plan.
+
+    The executor:
+    1. Derives step dependencies from RESULT_STEP_N placeholders
+    2. Runs independent steps concurrently, up to EXECUTOR_MAX_CONCURRENCY
+    3. Holds back save_playlist_to_spotify until the user approves it
+    4. Stores each result under its step_N key
+    5. Stops dispatching new steps as soon as one fails, so it can be replanned
+    """
+    plan = state.get("plan") or []
+    step_results = state.get("step_results", {}).copy()
+    tracks = dict(state.get("tracks") or {})
+    new_tracks: TrackTable = {}
+    completed = set(state.get("completed_steps") or [])
+
+    # Check if we've completed all steps
+    if len(completed) >= len(plan):
+        logger.info("Execution complete - all steps finished")
         return {
+            "execution_complete": True,
             "step_results": step_results,
-            "needs_replan": True,
-            "replan_reason": f"Step {current_step + 1} ({tool_name}) error: {str(e)}"
+            "current_step": len(plan)
         }
 
+    dependencies = get_step_dependencies(plan)
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_STEPS)
+    running: Dict[asyncio.Task, int] = {}
+    new_results: Dict[int, Any] = {}
+    awaiting_approval: Set[int] = set()
+    failures: Dict[int, Dict[str, Any]] = {}
+
+    while True:
+        # Dispatch every step whose dependencies are satisfied
+        if not failures:
+            for index, step in enumerate(plan):
+                if index in completed or index in awaiting_approval or index in running.values():
+                    continue
+                if not dependencies[index] <= completed:
+                    continue
+                if step.get("tool") == "save_playlist_to_spotify" and not state.get("user_approved"):
+                    awaiting_approval.add(index)
+                    continue
+
+                task = asyncio.create_task(run_step(index, step, {**step_results}, state, semaphore, tracks))
+                running[task] = index
+
+        if not running:
+            break
+
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            index = running.pop(task)
+            outcome = task.result()
+            if "failure" in outcome:
+                failures[index] = outcome["failure"]
+            else:
+                new_results[index] = outcome["result"]
+                step_results[f"step_{index + 1}"] = outcome["result"]
+                tracks.update(outcome["tracks"])
+                new_tracks.update(outcome["tracks"])
+                completed.add(index)
+
+    # Store results in plan order so downstream consumers see a stable order
+    for index in sorted(new_results):
+        step_results.pop(f"step_{index + 1}")
+        step_results[f"step_{index + 1}"] = new_results[index]
+
+    update = {
+        "step_results": step_results,
+        "tracks": new_tracks,
+        "result_tracks": {
+            uri: tracks[uri]
+            for index in sorted(new_results)
+            for uri in result_uris(new_results[index])
+            if uri in tracks
+        },
+        "completed_steps": sorted(completed)
+    }
+    if new_results:
+        update["last_tool_result"] = new_results[max(new_results)]
+
+    if failures:
+        failed_index = min(failures)
+        update.update(failures[failed_index])
+        update["current_step"] = failed_index
+        return update
+
+    remaining = [index for index in range(len(plan)) if index not in completed]
+    if not remaining:
+        update["current_step"] = len(plan)
+        update["execution_complete"] = True
+        return update
+
+    # Everything still outstanding is waiting on the approval step
+    approval_index = min(awaiting_approval)
+    update["current_step"] = approval_index
+    step = plan[approval_index]
+    resolved_args = resolve_args(step.get("args", {}), step_results, state, tracks)
+    update.update(build_approval_pause(approval_index, step.get("tool", ""), resolved_args))
+    return update
+
 
 APPROVAL_DECISION_PROMPT = """You asked the user for permission to perform this action:
 {pending_action}
@@ -201,25 +356,30 @@ async def approval_handler_node(state: PlanningAgentState) -> Dict[str, Any]:
 
     This node uses an LLM to understand whether the user approved, rejected,
     or said something else that needs clarification.
+
+    The run pauses at interrupt() until the next turn resumes it from the
+    checkpoint with the user's reply.
     """
-    user_reply = state.get("query", "")
-    pending_action = state.get("pending_action", {})
+    pending_action = state.get("pending_action") or {}
     action_description = pending_action.get("description", "create a playlist on Spotify")
 
+    user_reply = interrupt({
+        "prompt": state.get("formatted_response", ""),
+        "action": action_description
+    })
+
     logger.info(f"Processing approval response: '{user_reply[:50]}...'")
 
     # Use LLM to interpret the user's response
     try:
-        model_client = get_model_client()
-
         prompt = APPROVAL_DECISION_PROMPT.format(
             pending_action=action_description,
             user_reply=user_reply
         )
 
-        response = await model_client.ainvoke([
+        response = await ainvoke_for_node("approval_handler", [
             {"role": "user", "content": prompt}
-        ])
+        ], state.get("model_tiers"))
 
         # Parse the LLM response
         parsed = extract_json_from_llm_response(response.content)
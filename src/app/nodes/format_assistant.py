@@ -1,13 +1,23 @@
 """
 Format assistant node for formatting results into user-friendly responses.
+
+Formatter modes (FORMATTER_MODE, or formatter_mode per request):
+- llm: the formatting model writes the whole response (default)
+- template: deterministic templates only, no LLM call
+- flair: templates, with a one-line LLM opener when LLM load is low
 """
+import os
 import json
+import asyncio
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from state import PlanningAgentState
 from core.prompt import PromptManager
-from config.llm_config import get_model_client
+from config.llm_config import ainvoke_for_node
+from config.llm_metrics import get_llm_tracker
+from nodes.response_templates import render_response
+from storage.track_store import TrackTable, result_tracks
 
 logger = logging.getLogger(__name__)
 
@@ -39,37 +49,57 @@ Write your response now. Be conversational, not robotic.
 """
 
 
-def extract_all_tracks(step_results: Dict[str, Any]) -> List[Dict]:
-    """Extract all tracks from step results."""
-    all_tracks = []
+FLAIR_PROMPT = """You are Sporky, an enthusiastic audiophile assistant. Write ONE short, upbeat sentence (at most 25 words) introducing these results for the request "{query}". Do not list tracks.
+
+## Results
+{results}
+"""
+
+FORMATTER_MODES = ("llm", "template", "flair")
+
 
-    for key, result in step_results.items():
-        if isinstance(result, dict) and "tracks" in result:
-            tracks = result["tracks"]
-            if isinstance(tracks, list):
-                all_tracks.extend(tracks)
+def resolve_formatter_mode(state: PlanningAgentState) -> str:
+    """Per-request formatter mode, falling back to FORMATTER_MODE."""
+    mode = state.get("formatter_mode") or os.getenv("FORMATTER_MODE", "llm")
+    return mode if mode in FORMATTER_MODES else "llm"
 
-    # Remove duplicates by URI
-    seen_uris = set()
-    unique_tracks = []
-    for track in all_tracks:
-        uri = track.get("uri", "")
-        if uri and uri not in seen_uris:
-            seen_uris.add(uri)
-            unique_tracks.append(track)
 
-    return unique_tracks
+async def generate_flair(state: PlanningAgentState, results_summary: str) -> Optional[str]:
+    """
+    One-line LLM opener for template responses.
 
+    Skipped (returns None) when more than FORMATTER_FLAIR_MAX_IN_FLIGHT LLM
+    calls are already running, or when it takes longer than
+    FORMATTER_FLAIR_TIMEOUT_SECONDS.
+    """
+    if get_llm_tracker().in_flight() >= int(os.getenv("FORMATTER_FLAIR_MAX_IN_FLIGHT", "4")):
+        return None
 
-def format_results_summary(step_results: Dict[str, Any]) -> str:
+    prompt = FLAIR_PROMPT.format(query=state.get("query", ""), results=results_summary)
+    try:
+        response = await asyncio.wait_for(
+            ainvoke_for_node("format_assistant", [
+                {"role": "user", "content": prompt}
+            ], state.get("model_tiers")),
+            timeout=float(os.getenv("FORMATTER_FLAIR_TIMEOUT_SECONDS", "3"))
+        )
+    except Exception as e:
+        logger.info(f"Skipping flair: {e!r}")
+        return None
+
+    flair = response.content.strip().replace("<END_CONVERSATION>", "")
+    return flair.splitlines()[0] if flair else None
+
+
+def format_results_summary(step_results: Dict[str, Any], track_table: TrackTable) -> str:
     """Create a summary of the execution results for the LLM."""
     summary_parts = []
 
     for key, result in sorted(step_results.items()):
         if isinstance(result, dict):
-            if "tracks" in result:
+            if "track_uris" in result or "tracks" in result:
                 # Search result
-                tracks = result["tracks"]
+                tracks = result_tracks(result, track_table)
                 query = result.get("query", "search")
                 summary_parts.append(f"Search for '{query}': Found {len(tracks)} tracks")
                 for i, track in enumerate(tracks[:15], 1):  # Limit to 15 for prompt
@@ -129,12 +159,22 @@ async def format_assistant_node(state: PlanningAgentState) -> Dict[str, Any]:
             "formatted_response": "Hmm, I didn't find anything. Could you try rephrasing your request?"
         }
 
+    track_table = state.get("tracks") or {}
+    mode = resolve_formatter_mode(state)
+    if mode == "template":
+        return {"formatted_response": render_response(state.get("query", ""), step_results, track_table)}
+
     # Create results summary
-    results_summary = format_results_summary(step_results)
+    results_summary = format_results_summary(step_results, track_table)
+
+    if mode == "flair":
+        flair = await generate_flair(state, results_summary)
+        return {"formatted_response": render_response(
+            state.get("query", ""), step_results, track_table, opener=flair
+        )}
 
     # Use LLM to format the response
     prompt_manager = PromptManager()
-    model_client = get_model_client()
 
     format_prompt = FORMAT_PROMPT.format(
         query=state.get("query", ""),
@@ -142,10 +182,10 @@ async def format_assistant_node(state: PlanningAgentState) -> Dict[str, Any]:
     )
 
     try:
-        response = await model_client.ainvoke([
+        response = await ainvoke_for_node("format_assistant", [
             {"role": "system", "content": format_prompt},
             {"role": "user", "content": "Format the results above into a friendly response."}
-        ])
+        ], state.get("model_tiers"))
 
         formatted = response.content.strip()
         # Clean up any special tokens
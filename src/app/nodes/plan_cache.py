@@ -0,0 +1,135 @@
+"""
+plan_cache.py - Cache of planner output
+
+Plans are keyed on the normalized query plus a fingerprint of the context
+the planner prompt depends on (saved-playlist names). Only plans for
+queries without conversation history are cached, since a follow-up's plan
+depends on that conversation. Entries are evicted LRU with a TTL. When
+PLAN_CACHE_SIMILARITY is set, a miss falls back to the most similar cached
+query with the same fingerprint, compared by TF-IDF cosine similarity.
+"""
+import os
+import re
+import copy
+import math
+import hashlib
+import threading
+from collections import Counter
+from typing import List, Dict, Optional, Any
+
+from cachetools import TTLCache
+
+
+def normalize_plan_query(query: str) -> str:
+    """Normalize a query so trivially different phrasings share a key."""
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+def context_fingerprint(saved_playlist_names: List[str]) -> str:
+    """Fingerprint the session context that shapes the planner's output."""
+    names = "\n".join(sorted(name.lower() for name in saved_playlist_names))
+    return hashlib.sha1(names.encode("utf-8")).hexdigest()[:16]
+
+
+def _tfidf(tokens: List[str], idf: Dict[str, float]) -> Dict[str, float]:
+    counts = Counter(tokens)
+    vector = {term: count * idf.get(term, 0.0) for term, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+
+class PlanCache:
+    """LRU/TTL cache of plans with optional TF-IDF near-match lookup."""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600.0, similarity: float = 0.0):
+        self._entries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._similarity = similarity
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def get(self, query: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Get a cached plan for a query in this context, or None on a miss."""
+        normalized = normalize_plan_query(query)
+        with self._lock:
+            entry = self._entries.get((fingerprint, normalized))
+            if entry is not None:
+                self.hits += 1
+                return copy.deepcopy(entry)
+
+            if self._similarity > 0:
+                entry = self._most_similar(normalized, fingerprint)
+                if entry is not None:
+                    self.similar_hits += 1
+                    return copy.deepcopy(entry)
+
+            self.misses += 1
+            return None
+
+    def _most_similar(self, normalized: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        candidates = [
+            (cached_query, entry)
+            for (cached_fingerprint, cached_query), entry in self._entries.items()
+            if cached_fingerprint == fingerprint
+        ]
+        if not candidates:
+            return None
+
+        documents = [normalized.split()] + [cached_query.split() for cached_query, _ in candidates]
+        doc_freq = Counter(term for doc in documents for term in set(doc))
+        idf = {term: math.log((1 + len(documents)) / (1 + df)) + 1 for term, df in doc_freq.items()}
+
+        query_vector = _tfidf(documents[0], idf)
+        best_score, best_entry = 0.0, None
+        for tokens, (_, entry) in zip(documents[1:], candidates):
+            vector = _tfidf(tokens, idf)
+            score = sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items())
+            if score > best_score:
+                best_score, best_entry = score, entry
+
+        return best_entry if best_score >= self._similarity else None
+
+    def set(self, query: str, fingerprint: str, plan: List[Dict], plan_string: str) -> None:
+        """Store the plan produced for a query in this context."""
+        with self._lock:
+            self._entries[(fingerprint, normalize_plan_query(query))] = {
+                "plan": copy.deepcopy(plan),
+                "plan_string": plan_string,
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """Report cache size and hit rates."""
+        with self._lock:
+            hits = self.hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self._entries.maxsize,
+                "similarity_threshold": self._similarity,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+
+_cache: Optional[PlanCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> Optional[PlanCache]:
+    """Get the process-wide plan cache, or None when PLAN_CACHE_MAX_SIZE is 0."""
+    global _cache
+    maxsize = int(os.getenv("PLAN_CACHE_MAX_SIZE", "512"))
+    if maxsize <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PlanCache(
+                    maxsize=maxsize,
+                    ttl=float(os.getenv("PLAN_CACHE_TTL_SECONDS", "3600")),
+                    similarity=float(os.getenv("PLAN_CACHE_SIMILARITY", "0"))
+                )
+    return _cache
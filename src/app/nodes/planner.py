@@ -2,16 +2,24 @@
 Planner node for the Planning Agent workflow.
 
 The planner analyzes the user's query and creates a multi-step plan
-using the available tools.
+using the available tools. With PLANNER_SPECULATIVE=true (the default) the
+plan is streamed, and search steps are started as soon as they appear in
+the output (see speculation.py).
 """
+import os
 import json
+import uuid
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from state import PlanningAgentState
 from core.prompt import PromptManager
-from config.llm_config import get_model_client
+from config.llm_config import ainvoke_for_node, astream_for_node, can_stream_for_node
 from tools.llm_tools import extract_json_from_llm_response
+from storage.firestore_store import get_session_store
+from nodes.plan_cache import get_plan_cache, context_fingerprint
+from nodes.executor import resolve_args
+from nodes.speculation import PlanStepScanner, get_speculation_registry, is_speculative
 
 logger = logging.getLogger(__name__)
 
@@ -30,27 +38,29 @@ def format_history(history: List[Dict]) -> str:
     return "\n".join(formatted)
 
 
-def format_saved_playlists(session_id: str) -> str:
-    """Get list of saved playlists for the session."""
+async def fetch_saved_playlists(session_id: str) -> Optional[List[Dict]]:
+    """Get saved playlists for the session, or None if they could not be read."""
     try:
-        from firebase_admin import firestore
-        db = firestore.client()
-
-        collection_ref = db.collection('playlists').document(session_id).collection('saved_playlists')
-        docs = collection_ref.stream()
-
-        playlists = []
-        for doc in docs:
-            data = doc.to_dict()
-            playlists.append(f"- {data.get('name', doc.id)} ({data.get('track_count', 0)} tracks)")
-
-        if playlists:
-            return "\n".join(playlists)
-        return "No saved playlists yet."
+        return await get_session_store().list_saved_playlists(session_id)
     except Exception as e:
         logger.warning(f"Could not fetch saved playlists: {e}")
+        return None
+
+
+def format_saved_playlists(saved: Optional[List[Dict]]) -> str:
+    """Format the session's saved playlists for the prompt."""
+    if saved is None:
         return "Unable to fetch saved playlists."
 
+    playlists = [
+        f"- {data['name']} ({data['track_count']} tracks)"
+        for data in saved
+    ]
+
+    if playlists:
+        return "\n".join(playlists)
+    return "No saved playlists yet."
+
 
 def parse_plan(response_content: str) -> Dict[str, Any]:
     """Parse the LLM response to extract the plan."""
@@ -84,6 +94,42 @@ def parse_plan(response_content: str) -> Dict[str, Any]:
     }
 
 
+async def stream_plan(
+    state: PlanningAgentState,
+    messages: List[Dict[str, Any]],
+    speculation_id: str
+) -> str:
+    """
+    Stream the planner's response, starting eligible steps as they complete.
+
+    Uses a regular (hedged) call instead when the planner's primary provider
+    has its circuit open, and falls back to one if the stream fails or runs
+    past LLM_REQUEST_TIMEOUT_SECONDS. Steps already started speculatively
+    are matched against the fallback's plan like any other.
+    """
+    scanner = PlanStepScanner()
+    registry = get_speculation_registry()
+    parts: List[str] = []
+
+    if not can_stream_for_node("planner", state.get("model_tiers")):
+        logger.info("Planner provider circuit is open, planning without streaming")
+        response = await ainvoke_for_node("planner", messages, state.get("model_tiers"))
+        return response.content
+
+    try:
+        async for text in astream_for_node("planner", messages, state.get("model_tiers")):
+            parts.append(text)
+            for step in scanner.feed(text):
+                if is_speculative(step):
+                    registry.start(speculation_id, step, resolve_args(step.get("args", {}), {}, state))
+    except Exception as e:
+        logger.warning(f"Planner stream failed, retrying without streaming: {e!r}")
+        response = await ainvoke_for_node("planner", messages, state.get("model_tiers"))
+        return response.content
+
+    return "".join(parts)
+
+
 async def planner_node(state: PlanningAgentState) -> Dict[str, Any]:
     """
     Generate a plan based on the user's query.
@@ -93,11 +139,32 @@ async def planner_node(state: PlanningAgentState) -> Dict[str, Any]:
     """
     logger.info(f"Planner processing query: {state['query']}")
 
+    saved = await fetch_saved_playlists(state.get("session_id", ""))
+
+    # Reuse a plan made earlier for the same query in the same context. Plans
+    # made with conversation history depend on that history ("more like
+    # that"), so only opening queries are cached.
+    plan_cache = get_plan_cache() if saved is not None and not state.get("history") else None
+    fingerprint = None
+    if plan_cache is not None:
+        fingerprint = context_fingerprint([data['name'] for data in saved])
+        cached = plan_cache.get(state["query"], fingerprint)
+        if cached is not None:
+            logger.info(f"Plan cache hit: {len(cached['plan'])} step plan")
+            return {
+                "plan": cached["plan"],
+                "plan_string": cached["plan_string"],
+                "current_step": 0,
+                "completed_steps": [],
+                "step_results": {},
+                "execution_complete": False
+            }
+
     prompt_manager = PromptManager()
 
     # Format context for the prompt
     history_str = format_history(state.get("history", []))
-    saved_playlists_str = format_saved_playlists(state.get("session_id", ""))
+    saved_playlists_str = format_saved_playlists(saved)
 
     # Get the planner prompt
     system_prompt = prompt_manager.get_prompt(
@@ -107,24 +174,32 @@ async def planner_node(state: PlanningAgentState) -> Dict[str, Any]:
         query=state["query"]
     )
 
-    model_client = get_model_client()
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": state["query"]}
+    ]
+    speculative = os.getenv("PLANNER_SPECULATIVE", "true").lower() == "true"
+    speculation_id = uuid.uuid4().hex if speculative else None
+    registry = get_speculation_registry()
 
     try:
-        response = await model_client.ainvoke([
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": state["query"]}
-        ])
+        if speculative:
+            content = await stream_plan(state, messages, speculation_id)
+        else:
+            response = await ainvoke_for_node("planner", messages, state.get("model_tiers"))
+            content = response.content
 
-        logger.debug(f"Planner raw response: {response.content[:500]}")
+        logger.debug(f"Planner raw response: {content[:500]}")
 
         # Parse the plan
-        parsed = parse_plan(response.content)
+        parsed = parse_plan(content)
 
         if "error" in parsed:
             logger.error(f"Failed to parse plan: {parsed['error']}")
+            registry.discard(speculation_id)
             return {
                 "error": parsed["error"],
-                "plan_string": response.content
+                "plan_string": content
             }
 
         plan = parsed.get("plan", [])
@@ -133,6 +208,12 @@ async def planner_node(state: PlanningAgentState) -> Dict[str, Any]:
 
         logger.info(f"Planner created {len(plan)} step plan, requires_approval={requires_approval}")
 
+        # Keep speculative runs the final plan still contains
+        if speculation_id:
+            kept = registry.confirm(speculation_id, plan)
+            if kept:
+                logger.info(f"Reusing {kept} speculatively started step(s)")
+
         # If the plan requires approval, set up the pending action
         if requires_approval:
             # Find the save_playlist_to_spotify step
@@ -140,7 +221,8 @@ async def planner_node(state: PlanningAgentState) -> Dict[str, Any]:
                 if step.get("tool") == "save_playlist_to_spotify":
                     return {
                         "plan": plan,
-                        "plan_string": response.content,
+                        "plan_string": content,
+                        "speculation_id": speculation_id,
                         "awaiting_approval": True,
                         "pending_action": {
                             "tool": "save_playlist_to_spotify",
@@ -151,16 +233,23 @@ async def planner_node(state: PlanningAgentState) -> Dict[str, Any]:
                         "formatted_response": approval_message
                     }
 
+        # Plans that pause for approval are never cached
+        if plan_cache is not None and plan:
+            plan_cache.set(state["query"], fingerprint, plan, content)
+
         return {
             "plan": plan,
-            "plan_string": response.content,
+            "plan_string": content,
+            "speculation_id": speculation_id,
             "current_step": 0,
+            "completed_steps": [],
             "step_results": {},
             "execution_complete": False
         }
 
     except Exception as e:
         logger.error(f"Planner error: {e}")
+        registry.discard(speculation_id)
         return {
             "error": f"Planner failed: {str(e)}"
         }
@@ -2,32 +2,43 @@
 Replanner node for the Planning Agent workflow.
 
 The replanner is invoked when a step fails or needs adjustment.
-It analyzes what went wrong and creates a modified plan.
+It analyzes what went wrong and plans only the remaining work: completed
+steps are kept as fixed steps 1..K (with their results renumbered to
+match) and the LLM's steps are appended after them, so finished tool
+calls never run again.
 """
+import re
 import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
 from state import PlanningAgentState
-from config.llm_config import get_model_client
+from config.llm_config import ainvoke_for_node
 from tools.llm_tools import extract_json_from_llm_response
+from nodes.speculation import get_speculation_registry, step_key
 
 logger = logging.getLogger(__name__)
 
+REF_PATTERN = re.compile(r"^RESULT_STEP_(\d+)$")
+
 REPLANNER_PROMPT = """You are Sporky's replanning agent. A step in the plan failed and you need to adjust.
 
 ## Context
 **Original Query:** {query}
-**Original Plan:** {original_plan}
-**Completed Steps:** {completed_steps}
+**Original Plan (original numbering):** {original_plan}
+**Completed Steps (already done, renumbered 1-{completed_count}):** {completed_steps}
 **Failed Step:** {failed_step}
 **Error:** {error}
 
 ## Your Task
-Create a modified plan that:
-1. Works around the failure
-2. Still achieves the user's goal
-3. Uses the successful results from completed steps
+Plan ONLY the remaining work. Completed steps are fixed: their results are
+available as RESULT_STEP_1 to RESULT_STEP_{completed_count} and must not be repeated.
+Create the remaining steps so that they:
+1. Work around the failure
+2. Still achieve the user's goal
+3. Reuse completed results through RESULT_STEP_N instead of repeating those calls
+
+Number your steps starting at {next_step}.
 
 ## Available Tools
 - search_spotify: Search for tracks
@@ -40,7 +51,7 @@ Output a JSON object:
 ```json
 {{
   "plan": [
-    {{"step": 1, "tool": "tool_name", "args": {{}}, "reasoning": "why"}}
+    {{"step": {next_step}, "tool": "tool_name", "args": {{}}, "reasoning": "why"}}
   ],
   "message": "Brief explanation of the adjusted plan"
 }}
@@ -59,6 +70,82 @@ Output ONLY valid JSON.
 """
 
 
+def remap_refs(args: Dict[str, Any], mapping: Dict[int, int]) -> Dict[str, Any]:
+    """Rewrite RESULT_STEP_N placeholders through an old -> new step number mapping."""
+    remapped = {}
+    for key, value in args.items():
+        match = REF_PATTERN.match(value) if isinstance(value, str) else None
+        if match and int(match.group(1)) in mapping:
+            remapped[key] = f"RESULT_STEP_{mapping[int(match.group(1))]}"
+        else:
+            remapped[key] = value
+    return remapped
+
+
+def summarize_result(result: Any) -> str:
+    """Short description of a step result for the prompt."""
+    if not isinstance(result, dict):
+        return "done"
+    if "track_uris" in result:
+        return f"{len(result['track_uris'])} tracks"
+    if "playlists" in result:
+        return f"{len(result['playlists'])} saved playlists"
+    return result.get("message", "done")
+
+
+def compact_completed(
+    plan: List[Dict[str, Any]],
+    completed: List[int],
+    step_results: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Move completed steps to the front of the plan as steps 1..K.
+
+    Returns:
+        Tuple of (fixed steps, step_results keyed by the new numbering)
+    """
+    old_to_new = {old + 1: new + 1 for new, old in enumerate(completed)}
+    fixed_steps, fixed_results = [], {}
+    for old in completed:
+        number = old_to_new[old + 1]
+        step = dict(plan[old])
+        step["step"] = number
+        step["args"] = remap_refs(step.get("args", {}), old_to_new)
+        fixed_steps.append(step)
+        fixed_results[f"step_{number}"] = step_results.get(f"step_{old + 1}")
+    return fixed_steps, fixed_results
+
+
+def append_suffix(fixed_steps: List[Dict[str, Any]], suffix: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Append the replanned steps after the fixed ones.
+
+    Steps are renumbered by position. A new step identical to an earlier
+    one is dropped, and later references to it point at the earlier step.
+    """
+    plan = list(fixed_steps)
+    fixed_count = len(fixed_steps)
+    known = {step_key(step): step["step"] for step in fixed_steps}
+    mapping: Dict[int, int] = {}
+
+    for step in suffix:
+        declared = step.get("step")
+        step = {**step, "args": remap_refs(step.get("args", {}), mapping)}
+        number = known.get(step_key(step))
+        if number is not None:
+            logger.info(f"Dropping replanned step {declared}: it repeats step {number}")
+        else:
+            number = len(plan) + 1
+            step["step"] = number
+            plan.append(step)
+            known[step_key(step)] = number
+        # Numbers up to K always mean the fixed steps
+        if isinstance(declared, int) and declared > fixed_count:
+            mapping[declared] = number
+
+    return plan
+
+
 async def replanner_node(state: PlanningAgentState) -> Dict[str, Any]:
     """
     Create a modified plan when execution fails.
@@ -70,22 +157,26 @@ async def replanner_node(state: PlanningAgentState) -> Dict[str, Any]:
     """
     logger.info(f"Replanner invoked: {state.get('replan_reason', 'Unknown reason')}")
 
+    # Speculative runs not yet claimed belong to the plan being replaced
+    get_speculation_registry().discard(state.get("speculation_id"))
+
     original_plan = state.get("plan", [])
     current_step = state.get("current_step", 0)
     step_results = state.get("step_results", {})
     replan_reason = state.get("replan_reason", "Unknown error")
 
-    # Get completed steps info
-    completed_steps = []
-    for i in range(current_step):
-        step = original_plan[i] if i < len(original_plan) else {}
-        result_key = f"step_{i + 1}"
-        result = step_results.get(result_key, {})
-        completed_steps.append({
-            "step": i + 1,
+    # Completed steps become fixed steps 1..K of the new plan
+    completed = [i for i in sorted(state.get("completed_steps") or []) if i < len(original_plan)]
+    fixed_steps, fixed_results = compact_completed(original_plan, completed, step_results)
+    completed_steps = [
+        {
+            "step": step["step"],
             "tool": step.get("tool", ""),
-            "success": result.get("success", False) if isinstance(result, dict) else True
-        })
+            "args": step.get("args", {}),
+            "result": summarize_result(fixed_results[f"step_{step['step']}"])
+        }
+        for step in fixed_steps
+    ]
 
     # Get the failed step info
     failed_step = original_plan[current_step] if current_step < len(original_plan) else {}
@@ -93,18 +184,18 @@ async def replanner_node(state: PlanningAgentState) -> Dict[str, Any]:
     prompt = REPLANNER_PROMPT.format(
         query=state.get("query", ""),
         original_plan=json.dumps(original_plan, indent=2),
+        completed_count=len(fixed_steps),
         completed_steps=json.dumps(completed_steps, indent=2),
         failed_step=json.dumps(failed_step, indent=2),
-        error=replan_reason
+        error=replan_reason,
+        next_step=len(fixed_steps) + 1
     )
 
-    model_client = get_model_client()
-
     try:
-        response = await model_client.ainvoke([
+        response = await ainvoke_for_node("replanner", [
             {"role": "system", "content": prompt},
             {"role": "user", "content": f"Replan to handle the failure: {replan_reason}"}
-        ])
+        ], state.get("model_tiers"))
 
         # Parse the response
         result = extract_json_from_llm_response(response.content)
@@ -139,15 +230,22 @@ async def replanner_node(state: PlanningAgentState) -> Dict[str, Any]:
                 "needs_replan": False
             }
 
-        new_plan = result.get("plan", [])
+        suffix = result.get("plan", [])
         message = result.get("message", "Plan adjusted")
+        new_plan = append_suffix(fixed_steps, suffix)
 
-        logger.info(f"Replanner created new {len(new_plan)} step plan: {message}")
+        logger.info(
+            f"Replanner kept {len(fixed_steps)} completed steps and planned "
+            f"{len(new_plan) - len(fixed_steps)} more: {message}"
+        )
 
-        # Replace remaining plan with new plan
+        # Completed steps and their results carry over; only the suffix runs
         return {
             "plan": new_plan,
-            "current_step": 0,
+            "speculation_id": None,
+            "step_results": fixed_results,
+            "current_step": len(fixed_steps),
+            "completed_steps": list(range(len(fixed_steps))),
             "needs_replan": False,
             "replan_reason": None
         }
@@ -0,0 +1,126 @@
+"""
+Template rendering for format_assistant_node.
+
+Renders step results into a Sporky-voiced response without an LLM call.
+Templates are plain format strings built once at import; the opener is
+picked deterministically from the query so the same request always gets
+the same wording.
+"""
+import os
+import zlib
+from typing import Dict, Any, List, Optional
+
+from storage.track_store import TrackTable, result_tracks
+from tools.track_batch import TrackBatch
+
+OPENERS = [
+    "Ooh, good one! Here's what I dug up for \"{query}\":",
+    "Alright, let's warm up those speakers! Picks for \"{query}\":",
+    "Say no more. Here's a lineup for \"{query}\":",
+    "Crate-digging complete! Here's what I found for \"{query}\":",
+]
+TRACK_LINE = "{index}. **{name}** by {artist} ({album})"
+MORE_TRACKS = "...plus {count} more in the playlist."
+PLAYLIST_HEADER = "Here's what you've got saved:"
+PLAYLIST_LINE = "- **{name}** ({track_count} tracks)"
+NO_PLAYLISTS = "You haven't saved any playlists yet. Want me to start one?"
+SAVED_TO_MEMORY = "Saved **'{name}'** with {count} tracks to your playlists. 🎧"
+SAVED_TO_SPOTIFY = "Done! **'{name}'** ({count} tracks) is live on your Spotify: {url}"
+LOADED_PLAYLIST = "Here's your playlist **'{name}'**:"
+ERROR_LINE = "Heads up: {error}"
+SAVE_PROMPT = "Want me to save these as a playlist?"
+NOTHING_FOUND = "Hmm, I didn't find anything. Could you try rephrasing your request?"
+
+
+def pick_opener(query: str) -> str:
+    """Choose an opener from the query, stable across calls."""
+    return OPENERS[zlib.crc32(query.encode("utf-8")) % len(OPENERS)]
+
+
+def _dedupe_tracks(tracks: List[Dict], seen: set) -> List[Dict]:
+    unique = TrackBatch.from_dicts(tracks).dedup(exclude=seen)
+    seen.update(unique.uri_list())
+    return unique.to_dicts()
+
+
+def render_track_lines(tracks: List[Dict], max_tracks: int) -> List[str]:
+    """Numbered track list, truncated to max_tracks."""
+    lines = [
+        TRACK_LINE.format(
+            index=index,
+            name=track.get("name", "Unknown"),
+            artist=track.get("artist", "Unknown"),
+            album=track.get("album", "Unknown Album")
+        )
+        for index, track in enumerate(tracks[:max_tracks], 1)
+    ]
+    if len(tracks) > max_tracks:
+        lines.append(MORE_TRACKS.format(count=len(tracks) - max_tracks))
+    return lines
+
+
+def render_response(
+    query: str,
+    step_results: Dict[str, Any],
+    track_table: TrackTable,
+    opener: Optional[str] = None
+) -> str:
+    """
+    Render step results as a response.
+
+    Args:
+        query: The user's query
+        step_results: Results keyed by step_N, in plan order
+        track_table: Track dicts keyed by URI, for results holding track_uris
+        opener: Optional first line to use instead of a template opener
+    """
+    max_tracks = int(os.getenv("FORMATTER_TEMPLATE_MAX_TRACKS", "15"))
+    sections: List[str] = []
+    found_tracks: List[Dict] = []
+    seen_uris: set = set()
+    saved = False
+
+    for result in step_results.values():
+        if not isinstance(result, dict):
+            continue
+        if "playlists" in result:
+            playlists = result["playlists"]
+            if playlists:
+                sections.append("\n".join(
+                    [PLAYLIST_HEADER] + [
+                        PLAYLIST_LINE.format(name=pl.get("name", "Unnamed"), track_count=pl.get("track_count", 0))
+                        for pl in playlists
+                    ]
+                ))
+            else:
+                sections.append(NO_PLAYLISTS)
+        elif ("track_uris" in result or "tracks" in result) and "playlist_name" in result:
+            # A playlist read back from memory
+            tracks = _dedupe_tracks(result_tracks(result, track_table), seen_uris)
+            sections.append("\n".join(
+                [LOADED_PLAYLIST.format(name=result["playlist_name"])] + render_track_lines(tracks, max_tracks)
+            ))
+        elif "track_uris" in result or "tracks" in result:
+            found_tracks.extend(_dedupe_tracks(result_tracks(result, track_table), seen_uris))
+        elif "playlist_name" in result and "track_count" in result:
+            saved = True
+            if "spotify_url" in result:
+                sections.append(SAVED_TO_SPOTIFY.format(
+                    name=result["playlist_name"], count=result["track_count"], url=result["spotify_url"]
+                ))
+            else:
+                sections.append(SAVED_TO_MEMORY.format(name=result["playlist_name"], count=result["track_count"]))
+        elif "error" in result:
+            sections.append(ERROR_LINE.format(error=result["error"]))
+        elif "message" in result:
+            sections.append(result["message"])
+
+    if found_tracks:
+        header = opener or pick_opener(query).format(query=query)
+        sections.insert(0, "\n".join([header] + render_track_lines(found_tracks, max_tracks)))
+        if not saved:
+            sections.append(SAVE_PROMPT)
+    elif opener and sections:
+        sections.insert(0, opener)
+
+    return "\n\n".join(sections) if sections else NOTHING_FOUND
@@ -0,0 +1,241 @@
+"""
+Router node for the Planning Agent workflow.
+
+Sits in front of the planner and answers simple memory intents with a
+fixed one-step plan, skipping the planner's LLM call:
+
+- "list my playlists"             -> read_playlist_from_memory()
+- "show me my workout playlist"   -> read_playlist_from_memory(playlist_name=...)
+- "save this as Road Trip"        -> commit_playlist_to_memory(last result)
+
+Regex rules catch the common phrasings; a small token-overlap classifier
+handles the rest. Anything uncertain falls through to the planner.
+"""
+import os
+import re
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from state import PlanningAgentState
+from config.llm_metrics import get_llm_tracker
+from storage.firestore_store import get_session_store
+from storage.track_store import TrackTable, intern_tracks
+
+logger = logging.getLogger(__name__)
+
+LIST_PLAYLISTS = "list_playlists"
+SHOW_PLAYLIST = "show_playlist"
+SAVE_LAST = "save_last"
+SEARCH = "search"
+
+LIST_PATTERN = re.compile(
+    r"^(?:please\s+)?(?:list|show|display|what are|what's in|which are)(?:\s+me)?(?:\s+all)?"
+    r"(?:\s+of)?\s+(?:my\s+)?(?:saved\s+)?playlists$"
+    r"|^what\s+playlists\s+(?:do\s+i\s+have|have\s+i\s+saved)(?:\s+saved)?$",
+    re.IGNORECASE
+)
+SHOW_PATTERN = re.compile(
+    r"^(?:please\s+)?(?:show|open|get|read|pull up|bring up)(?:\s+me)?\s+(?:my\s+|the\s+)?"
+    r"(?P<name>.+?)(?P<keyword>\s+playlist)?$",
+    re.IGNORECASE
+)
+SAVE_PATTERN = re.compile(
+    r"^(?:please\s+)?(?:save|store|keep)\s+(?:this|that|these|it|them)"
+    r"(?:\s+(?:playlist|tracks|songs|list))?\s+(?:as|under)\s+"
+    r"(?:(?:a\s+)?playlist\s+(?:called|named)\s+)?(?P<name>.+)$",
+    re.IGNORECASE
+)
+
+# Exemplars for the fallback classifier; SEARCH soaks up music requests
+EXEMPLARS = {
+    LIST_PLAYLISTS: [
+        "what playlists have i got", "my playlists", "list playlists",
+        "which playlists did i save", "show saved playlists", "what have i saved",
+    ],
+    SEARCH: [
+        "find me songs", "play some music", "recommend tracks", "songs like",
+        "make me a playlist", "music for", "save to spotify", "top songs by",
+        "chill songs", "workout music", "upbeat tracks for",
+    ],
+}
+
+TOKEN_RE = re.compile(r"[\w']+")
+
+
+def _tokens(text: str) -> set:
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+def classify(query: str) -> Tuple[str, float]:
+    """Nearest-exemplar intent by Jaccard token overlap, with its score."""
+    tokens = _tokens(query)
+    best_intent, best_score = SEARCH, 0.0
+    for intent, examples in EXEMPLARS.items():
+        for example in examples:
+            example_tokens = _tokens(example)
+            score = len(tokens & example_tokens) / len(tokens | example_tokens)
+            if score > best_score:
+                best_intent, best_score = intent, score
+    return best_intent, best_score
+
+
+def _normalize(query: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[?!.]+$", "", query.strip()))
+
+
+def _clean_name(name: str) -> str:
+    return name.strip().strip("\"'").strip()
+
+
+def match_saved_playlist(name: str, saved: List[Dict], allow_partial: bool = False) -> Optional[str]:
+    """
+    Resolve a spoken playlist name to exactly one saved playlist, or None.
+
+    Names must match exactly (ignoring case) unless allow_partial, when a
+    single saved name containing the phrase also counts.
+    """
+    wanted = _clean_name(name).lower()
+    if not wanted:
+        return None
+    names = [data["name"] for data in saved]
+    exact = [n for n in names if n.lower() == wanted]
+    if len(exact) == 1:
+        return exact[0]
+    if not allow_partial:
+        return None
+    partial = [n for n in names if wanted in n.lower()]
+    return partial[0] if len(partial) == 1 else None
+
+
+class RouterStats:
+    """Counts routed and fallen-through queries and estimates time saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routed: Dict[str, int] = {}
+        self.fallthrough = 0
+        self.saved_ms = 0.0
+
+    def record(self, intent: Optional[str], saved_ms: float = 0.0) -> None:
+        with self._lock:
+            if intent is None:
+                self.fallthrough += 1
+            else:
+                self.routed[intent] = self.routed.get(intent, 0) + 1
+                self.saved_ms += saved_ms
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routed = sum(self.routed.values())
+            total = routed + self.fallthrough
+            return {
+                "routed": dict(self.routed),
+                "fallthrough": self.fallthrough,
+                "hit_rate": routed / total if total else 0.0,
+                "estimated_saved_ms": self.saved_ms,
+            }
+
+
+_stats = RouterStats()
+
+
+def get_router_stats() -> RouterStats:
+    """Get the process-wide router counters."""
+    return _stats
+
+
+def _step(tool: str, args: Dict[str, Any], reasoning: str) -> Dict[str, Any]:
+    return {"step": 1, "tool": tool, "args": args, "reasoning": reasoning}
+
+
+async def route_intent(query: str, session_id: str) -> Optional[Tuple[str, List[Dict[str, Any]], TrackTable]]:
+    """
+    Map a query to (intent, plan, track table entries) for a simple memory intent.
+
+    Returns None when the query needs the planner.
+    """
+    text = _normalize(query)
+    store = get_session_store()
+
+    if LIST_PATTERN.match(text):
+        return LIST_PLAYLISTS, [_step("read_playlist_from_memory", {"list_all": True}, "List saved playlists")], {}
+
+    save = SAVE_PATTERN.match(text)
+    if save:
+        name = _clean_name(save.group("name"))
+        # Exporting to Spotify needs the approval flow, which the planner owns
+        if not name or "spotify" in name.lower():
+            return None
+        uris, tracks = intern_tracks(await store.get_last_playlist(session_id))
+        if not uris:
+            return None
+        return SAVE_LAST, [_step(
+            "commit_playlist_to_memory",
+            {"playlist_name": name, "track_uris": uris},
+            "Save the last result playlist"
+        )], tracks
+
+    show = SHOW_PATTERN.match(text)
+    if show:
+        # Partial names only count when the query says "playlist"; "get me rock" is a search
+        name = match_saved_playlist(
+            show.group("name"),
+            await store.list_saved_playlists(session_id),
+            allow_partial=show.group("keyword") is not None
+        )
+        if name is None:
+            return None
+        return SHOW_PLAYLIST, [_step(
+            "read_playlist_from_memory",
+            {"playlist_name": name},
+            f"Retrieve the saved playlist '{name}'"
+        )], {}
+
+    intent, score = classify(text)
+    if intent == LIST_PLAYLISTS and score >= float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.6")):
+        return LIST_PLAYLISTS, [_step("read_playlist_from_memory", {"list_all": True}, "List saved playlists")], {}
+
+    return None
+
+
+async def router_node(state: PlanningAgentState) -> Dict[str, Any]:
+    """
+    Emit a plan directly for simple memory intents.
+
+    Returns an empty update when the query should go to the planner.
+    """
+    if os.getenv("ROUTER_ENABLED", "true").lower() != "true":
+        return {}
+
+    start = time.perf_counter()
+    try:
+        routed = await route_intent(state["query"], state.get("session_id", ""))
+    except Exception as e:
+        logger.warning(f"Router failed, falling back to planner: {e}")
+        routed = None
+
+    if routed is None:
+        _stats.record(None)
+        logger.debug("Router fell through to the planner")
+        return {}
+
+    intent, plan, tracks = routed
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    planner_ms = get_llm_tracker().report().get("reasoning", {}).get("p50_ms", 0.0)
+    _stats.record(intent, max(0.0, planner_ms - elapsed_ms))
+    logger.info(
+        f"Router handled '{intent}' in {elapsed_ms:.1f}ms "
+        f"(planner p50 {planner_ms:.0f}ms); hit rate {_stats.stats()['hit_rate']:.0%}"
+    )
+
+    return {
+        "plan": plan,
+        "plan_string": f"router:{intent}",
+        "current_step": 0,
+        "completed_steps": [],
+        "step_results": {},
+        "tracks": tracks,
+        "execution_complete": False
+    }
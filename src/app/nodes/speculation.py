@@ -0,0 +1,186 @@
+"""
+Speculative execution of plan steps while the planner is still writing.
+
+PlanStepScanner picks complete step objects out of the planner's JSON as
+it streams. Steps that are safe to run early (read-only tools with no
+RESULT_STEP_N inputs) are started right away and parked here under the
+run's speculation_id. Once the final plan is parsed, speculative results
+for steps it still contains are kept for the executor to claim; the rest
+are cancelled.
+"""
+import json
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+from tools.planning_tools import TOOL_REGISTRY
+from tools.runtime import get_tool_runtime
+
+logger = logging.getLogger(__name__)
+
+# Tools without side effects, so running one the final plan drops is harmless
+SPECULATIVE_TOOLS = {"search_spotify"}
+
+
+class PlanStepScanner:
+    """
+    Incremental scanner for the steps of a streamed {"plan": [...]} object.
+
+    feed() returns every step object completed by the new text. Anything
+    before the "plan" array (code fences, prose) is skipped.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._array_depth: Optional[int] = None  # Depth of the plan array, once found
+        self._depth = 0
+        self._step_start: Optional[int] = None
+        self._last_key = ""
+        self._key_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        self._buffer += text
+        steps = []
+        while self._pos < len(self._buffer) and not self.done:
+            char = self._buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._last_key = self._buffer[self._key_start:self._pos]
+                        self._key_start = None
+            elif char == '"':
+                self._in_string = True
+                if self._array_depth is None:
+                    self._key_start = self._pos + 1
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._array_depth is None and self._last_key == "plan":
+                    self._array_depth = self._depth
+                elif char == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._step_start = self._pos
+            elif char in "}]":
+                if char == "}" and self._step_start is not None and self._depth == self._array_depth + 1:
+                    step = self._parse(self._buffer[self._step_start:self._pos + 1])
+                    if step is not None:
+                        steps.append(step)
+                    self._step_start = None
+                elif char == "]" and self._depth == self._array_depth:
+                    self.done = True
+                self._depth -= 1
+            self._pos += 1
+        return steps
+
+    @staticmethod
+    def _parse(text: str) -> Optional[Dict[str, Any]]:
+        try:
+            step = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return step if isinstance(step, dict) and "tool" in step else None
+
+
+def step_key(step: Dict[str, Any]) -> Tuple[str, str]:
+    """Identity of a step for matching speculative runs against the final plan."""
+    return step.get("tool", ""), json.dumps(step.get("args", {}), sort_keys=True, default=str)
+
+
+def is_speculative(step: Dict[str, Any]) -> bool:
+    """Whether a step can safely run before the plan is final."""
+    if step.get("tool") not in SPECULATIVE_TOOLS:
+        return False
+    return "RESULT_STEP_" not in json.dumps(step.get("args", {}), default=str)
+
+
+class SpeculationRegistry:
+    """Speculative tool runs per graph run, waiting to be claimed by the executor."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self._runs: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.started = 0
+        self.claimed = 0
+        self.discarded = 0
+
+    def start(self, speculation_id: str, step: Dict[str, Any], resolved_args: Dict[str, Any]) -> bool:
+        """Start a step ahead of the final plan. Returns False if it isn't eligible."""
+        if not is_speculative(step):
+            return False
+        key = step_key(step)
+        tool_name = step["tool"]
+        with self._lock:
+            tasks = self._runs.setdefault(speculation_id, {})
+            if key in tasks:
+                return False
+            tasks[key] = asyncio.create_task(
+                get_tool_runtime().ainvoke(tool_name, TOOL_REGISTRY[tool_name], resolved_args)
+            )
+            self.started += 1
+        logger.info(f"Speculatively started {tool_name} {key[1][:80]}")
+        return True
+
+    def confirm(self, speculation_id: str, plan: List[Dict[str, Any]]) -> int:
+        """Keep runs matching a step of the final plan and cancel the rest. Returns how many were kept."""
+        wanted = {step_key(step) for step in plan}
+        with self._lock:
+            tasks = self._runs.get(speculation_id, {})
+            for key in [key for key in tasks if key not in wanted]:
+                tasks.pop(key).cancel()
+                self.discarded += 1
+            if not tasks:
+                self._runs.pop(speculation_id, None)
+            return len(tasks)
+
+    def claim(self, speculation_id: Optional[str], step: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """Take the speculative run for a step, if there is one."""
+        if not speculation_id:
+            return None
+        with self._lock:
+            tasks = self._runs.get(speculation_id)
+            if not tasks:
+                return None
+            task = tasks.pop(step_key(step), None)
+            if not tasks:
+                del self._runs[speculation_id]
+            if task is not None:
+                self.claimed += 1
+            return task
+
+    def discard(self, speculation_id: Optional[str]) -> None:
+        """Cancel every unclaimed run for a graph run."""
+        if not speculation_id:
+            return
+        with self._lock:
+            tasks = self._runs.pop(speculation_id, {})
+            for task in tasks.values():
+                task.cancel()
+            self.discarded += len(tasks)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report speculative run counters."""
+        with self._lock:
+            return {
+                "started": self.started,
+                "claimed": self.claimed,
+                "discarded": self.discarded,
+                "pending_runs": len(self._runs),
+            }
+
+
+_registry = SpeculationRegistry()
+
+
+def get_speculation_registry() -> SpeculationRegistry:
+    """Get the process-wide speculation registry."""
+    return _registry
@@ -1,7 +1,7 @@
 """
 State schema for the Planning Agent workflow.
 """
-from typing import TypedDict, Optional, List, Dict, Any
+from typing import TypedDict, Optional, List, Dict, Any, Annotated
 
 
 class PlanStep(TypedDict):
@@ -20,6 +20,40 @@ class PendingAction(TypedDict):
     description: str
 
 
+def merge_tracks(left: Optional[Dict[str, Dict]], right: Optional[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """
+    Reducer for the track table: nodes return only the tracks they added.
+
+    None (as set by create_initial_state) clears the table, so a new run
+    never inherits tracks from a stale checkpoint on its thread.
+    """
+    if right is None:
+        return {}
+    if not right:
+        return left or {}
+    return {**(left or {}), **right}
+
+
+def merge_result_tracks(left: Optional[Dict[str, Dict]], right: Optional[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """
+    Reducer for the result track aggregate, keyed by URI in step order.
+
+    Nodes return only the tracks of newly completed steps. The aggregate's
+    keys are its seen-set: new URIs are appended after it and known ones
+    skipped. The result is a new dict, since the previous one is shared
+    with earlier state snapshots. None clears it, as for merge_tracks.
+    """
+    if right is None:
+        return {}
+    if not right:
+        return left or {}
+    merged = dict(left or {})
+    for uri, track in right.items():
+        if uri not in merged:
+            merged[uri] = track
+    return merged
+
+
 class PlanningAgentState(TypedDict):
     """Central state object for the Planning Agent workflow."""
 
@@ -27,14 +61,20 @@ class PlanningAgentState(TypedDict):
     query: str
     history: Optional[List[Dict]]
     session_id: str
+    model_tiers: Optional[Dict[str, str]]  # Per-request node -> model tier overrides
+    formatter_mode: Optional[str]  # Per-request formatter mode: llm, template or flair
 
     # Planning phase
     plan: Optional[List[PlanStep]]
     plan_string: Optional[str]  # Raw plan output for debugging
+    speculation_id: Optional[str]  # Key of the planner's speculative step runs
 
     # Execution phase
-    current_step: int
-    step_results: Dict[str, Any]
+    current_step: int  # First plan step that has not completed yet
+    completed_steps: List[int]  # Indices of plan steps that finished successfully
+    step_results: Dict[str, Any]  # Track lists are stored as track_uris
+    tracks: Annotated[Dict[str, Dict], merge_tracks]  # Track table keyed by Spotify URI
+    result_tracks: Annotated[Dict[str, Dict], merge_result_tracks]  # Deduplicated tracks of all step results, by URI
     execution_complete: bool
     last_tool_result: Optional[Any]
 
@@ -57,17 +97,26 @@ class PlanningAgentState(TypedDict):
 def create_initial_state(
     query: str,
     session_id: str,
-    history: Optional[List[Dict]] = None
+    history: Optional[List[Dict]] = None,
+    model_tiers: Optional[Dict[str, str]] = None,
+    formatter_mode: Optional[str] = None
 ) -> PlanningAgentState:
     """Create an initial state for a new planning agent run."""
     return PlanningAgentState(
         query=query,
         history=history or [],
         session_id=session_id,
+        model_tiers=model_tiers,
+        formatter_mode=formatter_mode,
         plan=None,
         plan_string=None,
+        speculation_id=None,
         current_step=0,
+        completed_steps=[],
         step_results={},
+        # None resets the reducer fields, in case the thread has a stale checkpoint
+        tracks=None,
+        result_tracks=None,
         execution_complete=False,
         last_tool_result=None,
         awaiting_approval=False,
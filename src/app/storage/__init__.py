@@ -0,0 +1,29 @@
+"""
+Persistence layer for session state.
+"""
+from storage.firestore_store import FirestoreSessionStore, get_session_store
+from storage.session_cache import SessionCache, get_session_cache
+from storage.write_behind import SessionWriteBatch, WriteBehindWriter
+from storage.mood_catalog import MoodCatalog, get_mood_catalog
+from storage.checkpointer import get_checkpointer, close_checkpointer
+from storage.state_codec import EncodedState, encode_state, decode_state_blob, get_state_size_stats
+from storage.track_store import TrackTableCache, get_track_table_cache
+
+__all__ = [
+    "FirestoreSessionStore",
+    "get_session_store",
+    "SessionCache",
+    "get_session_cache",
+    "SessionWriteBatch",
+    "WriteBehindWriter",
+    "MoodCatalog",
+    "get_mood_catalog",
+    "get_checkpointer",
+    "close_checkpointer",
+    "EncodedState",
+    "encode_state",
+    "decode_state_blob",
+    "get_state_size_stats",
+    "TrackTableCache",
+    "get_track_table_cache",
+]
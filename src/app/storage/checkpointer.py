@@ -0,0 +1,75 @@
+"""
+checkpointer.py - LangGraph checkpointer for approval pauses
+
+When a plan needs the user's approval, approval_handler_node interrupts
+the graph and the paused run is kept here under a thread_id (the
+session_id). The next turn resumes it from the checkpoint instead of
+rebuilding state from a stored blob.
+
+CHECKPOINTER_BACKEND picks the implementation:
+
+- sqlite (default): local SQLite file at CHECKPOINT_DB_PATH, survives restarts
+- memory: in-process, for single-worker development
+
+Other backends plug in through CHECKPOINTER_BACKENDS; anything that
+implements LangGraph's BaseCheckpointSaver works.
+"""
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+import aiosqlite
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+logger = logging.getLogger(__name__)
+
+
+async def open_sqlite_checkpointer() -> BaseCheckpointSaver:
+    """Open the local SQLite checkpoint store."""
+    path = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.db")
+    saver = AsyncSqliteSaver(await aiosqlite.connect(path))
+    await saver.setup()
+    logger.info(f"Using SQLite checkpointer at {path}")
+    return saver
+
+
+async def open_memory_checkpointer() -> BaseCheckpointSaver:
+    """Keep checkpoints in process memory."""
+    return InMemorySaver()
+
+
+CHECKPOINTER_BACKENDS: Dict[str, Callable[[], Awaitable[BaseCheckpointSaver]]] = {
+    "sqlite": open_sqlite_checkpointer,
+    "memory": open_memory_checkpointer,
+}
+
+_checkpointer: Optional[BaseCheckpointSaver] = None
+_checkpointer_lock = asyncio.Lock()
+
+
+async def get_checkpointer() -> BaseCheckpointSaver:
+    """Get the process-wide checkpointer, opening it on first use."""
+    global _checkpointer
+    if _checkpointer is None:
+        async with _checkpointer_lock:
+            if _checkpointer is None:
+                backend = os.getenv("CHECKPOINTER_BACKEND", "sqlite").lower()
+                if backend not in CHECKPOINTER_BACKENDS:
+                    raise ValueError(
+                        f"Unknown CHECKPOINTER_BACKEND '{backend}'. "
+                        f"Choose from: {', '.join(CHECKPOINTER_BACKENDS)}"
+                    )
+                _checkpointer = await CHECKPOINTER_BACKENDS[backend]()
+    return _checkpointer
+
+
+async def close_checkpointer() -> None:
+    """Close the checkpointer's connection, if it has one."""
+    global _checkpointer
+    conn = getattr(_checkpointer, "conn", None)
+    if conn is not None:
+        await conn.close()
+    _checkpointer = None
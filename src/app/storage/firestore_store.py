@@ -0,0 +1,182 @@
+"""
+Async Firestore persistence for session state.
+
+All Firestore access on the request path goes through this module so that
+round trips are awaited on the async client instead of blocking the event
+loop. The store is shared by app.py, the planner and the memory tools.
+Reads are served from the session cache when possible and writes are
+written through to it. End-of-turn writes are staged with
+new_write_batch() and committed in the background by the write-behind
+writer.
+"""
+import logging
+from typing import Optional, Dict, Any, List
+
+from firebase_admin import firestore_async
+
+from storage.session_cache import (
+    SessionCache, get_session_cache, HISTORY, SAVED_PLAYLISTS, LAST_PLAYLIST
+)
+from storage.write_behind import SessionWriteBatch, WriteBehindWriter
+from storage.state_codec import decode_state_blob, BLOB_ENCODING
+from storage.track_store import TrackTable, intern_tracks, resolve_tracks, get_track_table_cache
+
+logger = logging.getLogger(__name__)
+
+
+class FirestoreSessionStore:
+    """Session-scoped reads and writes against the async Firestore client."""
+
+    def __init__(self, cache: Optional[SessionCache] = None):
+        self._db = None
+        self.cache = cache or get_session_cache()
+        self.writer = WriteBehindWriter(self.cache)
+
+    @property
+    def db(self):
+        """Lazily create the async client once firebase_admin is initialized."""
+        if self._db is None:
+            self._db = firestore_async.client()
+        return self._db
+
+    # ------------------------------------------------------------------
+    # Document references
+    # ------------------------------------------------------------------
+
+    def _history_ref(self, session_id: str):
+        return self.db.collection('chat_history').document(session_id)
+
+    def _playlist_ref(self, session_id: str):
+        return self.db.collection('playlists').document(session_id)
+
+    def _saved_playlists_ref(self, session_id: str):
+        return self._playlist_ref(session_id).collection('saved_playlists')
+
+    def _track_ref(self, uri: str):
+        return self.db.collection('tracks').document(uri)
+
+    # ------------------------------------------------------------------
+    # Chat history
+    # ------------------------------------------------------------------
+
+    async def get_history(self, session_id: str) -> Any:
+        """Get the stored conversation history for a session."""
+        found, history = self.cache.get(session_id, HISTORY)
+        if found:
+            return history
+
+        await self.writer.wait_for(session_id)
+        doc = await self._history_ref(session_id).get()
+        data = doc.to_dict() if doc.exists else {}
+        if data.get('encoding') == BLOB_ENCODING:
+            history = decode_state_blob(data['state'])
+        else:
+            # Documents written before states were stored as blobs
+            history = data.get('history', [])
+        self.cache.set(session_id, HISTORY, history)
+        return history
+
+    def new_write_batch(self, session_id: str) -> SessionWriteBatch:
+        """Start staging end-of-turn writes for a session."""
+        return SessionWriteBatch(self, session_id)
+
+    def submit(self, batch: SessionWriteBatch) -> None:
+        """Commit a staged batch in the background."""
+        self.writer.submit(batch)
+
+    # ------------------------------------------------------------------
+    # Track table
+    # ------------------------------------------------------------------
+
+    async def get_tracks(self, uris: List[str]) -> List[Dict[str, Any]]:
+        """Resolve track URIs against the track table, in order."""
+        track_cache = get_track_table_cache()
+        found, missing = track_cache.get_many(uris)
+        if missing:
+            loaded: TrackTable = {}
+            async for doc in self.db.get_all([self._track_ref(uri) for uri in missing]):
+                if doc.exists:
+                    loaded[doc.id] = doc.to_dict()
+            track_cache.add(loaded)
+            found.update(loaded)
+        return resolve_tracks(uris, found)
+
+    async def _playlist_tracks(self, data: Dict[str, Any], legacy_field: str) -> List[Dict[str, Any]]:
+        """Tracks of a playlist document, stored as URIs or (before the track table) inline."""
+        if 'track_uris' in data:
+            return await self.get_tracks(data['track_uris'])
+        return data.get(legacy_field, [])
+
+    # ------------------------------------------------------------------
+    # Playlists
+    # ------------------------------------------------------------------
+
+    async def get_last_playlist(self, session_id: str) -> List[Dict[str, Any]]:
+        """Get the tracks returned by the session's most recent turn."""
+        found, playlist = self.cache.get(session_id, LAST_PLAYLIST)
+        if found:
+            return playlist
+
+        await self.writer.wait_for(session_id)
+        doc = await self._playlist_ref(session_id).get()
+        playlist = await self._playlist_tracks(doc.to_dict() or {}, 'playlist') if doc.exists else []
+        self.cache.set(session_id, LAST_PLAYLIST, playlist)
+        return playlist
+
+    async def list_saved_playlists(self, session_id: str) -> List[Dict[str, Any]]:
+        """List saved playlists for a session without their tracks."""
+        found, playlists = self.cache.get(session_id, SAVED_PLAYLISTS)
+        if found:
+            return list(playlists)
+
+        playlists = []
+        async for doc in self._saved_playlists_ref(session_id).stream():
+            data = doc.to_dict()
+            playlists.append({
+                "name": data.get("name", doc.id),
+                "track_count": data.get("track_count", 0),
+                "description": data.get("description", "")
+            })
+        self.cache.set(session_id, SAVED_PLAYLISTS, playlists)
+        return list(playlists)
+
+    async def get_saved_playlist(self, session_id: str, playlist_name: str) -> Optional[Dict[str, Any]]:
+        """Get a saved playlist document with its tracks resolved, or None if it does not exist."""
+        doc = await self._saved_playlists_ref(session_id).document(playlist_name).get()
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        data["tracks"] = await self._playlist_tracks(data, 'tracks')
+        data.pop("track_uris", None)
+        return data
+
+    async def save_playlist(self, session_id: str, playlist_name: str, playlist_data: Dict[str, Any]) -> None:
+        """
+        Create or replace a saved playlist document.
+
+        The playlist's tracks are stored as URIs, with any tracks not yet in
+        the track table written in the same batch.
+        """
+        uris, table = intern_tracks(playlist_data.get("tracks", []))
+        document = {key: value for key, value in playlist_data.items() if key != "tracks"}
+        document["track_uris"] = uris
+
+        batch = self.new_write_batch(session_id)
+        batch.save_tracks(table)
+        batch.save_playlist(playlist_name, document)
+        try:
+            await batch.commit()
+        except Exception:
+            batch.rollback()
+            raise
+
+
+_store: Optional[FirestoreSessionStore] = None
+
+
+def get_session_store() -> FirestoreSessionStore:
+    """Get the process-wide session store."""
+    global _store
+    if _store is None:
+        _store = FirestoreSessionStore()
+    return _store
@@ -0,0 +1,167 @@
+"""
+mood_catalog.py - Precomputed answers for suggestion chips and top intents
+
+The catalog job (mood_catalog_job.py) runs the most common opening queries
+through the planning graph and stores the formatted response, track list
+and final state here. /query answers a fresh session's first message from
+this table when the query matches a stored intent. It also counts opening
+queries so the job can pick up new popular intents: counts are kept in
+memory on the request path and flushed to SQLite by the job, and only
+short queries seen at least MOOD_CATALOG_MIN_COUNT times become intents.
+
+The SQLite calls block, so async callers run them with asyncio.to_thread.
+
+The catalog is opt-in: it makes live LLM and Spotify calls on every
+refresh, so it only exists with MOOD_CATALOG_ENABLED=true and a
+MOOD_CATALOG_PATH to keep it at.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import Counter
+from typing import List, Dict, Optional, Any
+
+from storage.state_codec import encode_state
+
+# Suggestion chips shown on the landing screen (chat.py, chatapp.jsx)
+SUGGESTION_CHIPS = [
+    "Workout music",
+    "Stuff to listen while working",
+    "Sleep music",
+    "something completely random",
+]
+
+
+def normalize_intent(query: str) -> str:
+    """Normalize a query so chip clicks and retyped queries share an intent."""
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mood_catalog (
+    intent TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL,
+    playlist TEXT NOT NULL,
+    state TEXT NOT NULL,
+    refreshed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS intent_counts (
+    intent TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+"""
+
+
+class MoodCatalog:
+    """SQLite table of precomputed responses keyed by normalized intent."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending_counts: Counter = Counter()
+        self.max_intent_words = int(os.getenv("MOOD_CATALOG_MAX_INTENT_WORDS", "8"))
+        self.min_count = int(os.getenv("MOOD_CATALOG_MIN_COUNT", "2"))
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """Get the stored answer for a query, or None if the intent isn't cataloged."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, playlist, state, refreshed_at FROM mood_catalog WHERE intent = ?",
+                (normalize_intent(query),)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        response, playlist, state, refreshed_at = row
+        return {
+            "response": response,
+            "playlist": json.loads(playlist),
+            "state": json.loads(state),
+            "refreshed_at": refreshed_at,
+        }
+
+    def put(self, query: str, response: str, playlist: List[Dict], state: Dict[str, Any]) -> None:
+        """Store the answer for an intent."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO mood_catalog (intent, query, response, playlist, state, refreshed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (normalize_intent(query), query, response, json.dumps(playlist), encode_state(state).json.decode(), time.time())
+            )
+            self._db.commit()
+
+    def record_query(self, query: str) -> None:
+        """Count an opening query towards the top-intents list, in memory."""
+        intent = normalize_intent(query)
+        if not intent or len(intent.split()) > self.max_intent_words:
+            return
+        with self._lock:
+            self._pending_counts[intent] += 1
+
+    def flush_counts(self) -> None:
+        """Write the in-memory query counts to SQLite."""
+        with self._lock:
+            counts, self._pending_counts = self._pending_counts, Counter()
+            if not counts:
+                return
+            self._db.executemany(
+                "INSERT INTO intent_counts (intent, query, count) VALUES (?, ?, ?) "
+                "ON CONFLICT(intent) DO UPDATE SET count = count + excluded.count",
+                [(intent, intent, count) for intent, count in counts.items()]
+            )
+            self._db.commit()
+
+    def top_intents(self, limit: int) -> List[str]:
+        """Most frequent opening queries (normalized), most popular first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT intent FROM intent_counts WHERE count >= ? ORDER BY count DESC LIMIT ?",
+                (self.min_count, limit)
+            ).fetchall()
+        return [intent for (intent,) in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Report catalog size and hit rate."""
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM mood_catalog").fetchone()[0]
+            oldest = self._db.execute("SELECT MIN(refreshed_at) FROM mood_catalog").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "intents": size,
+                "oldest_age": time.time() - oldest if oldest else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_catalog: Optional[MoodCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def is_mood_catalog_enabled() -> bool:
+    """Whether the mood catalog is turned on (MOOD_CATALOG_ENABLED)."""
+    return os.getenv("MOOD_CATALOG_ENABLED", "false").lower() == "true"
+
+
+def get_mood_catalog() -> Optional[MoodCatalog]:
+    """Get the process-wide mood catalog, or None when it is disabled or has no path."""
+    global _catalog
+    path = os.getenv("MOOD_CATALOG_PATH", "")
+    if not is_mood_catalog_enabled() or not path:
+        return None
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = MoodCatalog(path)
+    return _catalog
@@ -0,0 +1,101 @@
+"""
+In-process session cache in front of Firestore.
+
+Holds chat history, the last result playlist and the saved-playlist index
+per session_id so that consecutive turns served by the same worker don't
+re-read Firestore. Entries are evicted LRU once the cache is full and
+expire after a TTL so writes from other workers are picked up eventually.
+"""
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+
+HISTORY = "history"
+SAVED_PLAYLISTS = "saved_playlists"
+LAST_PLAYLIST = "last_playlist"
+
+
+class SessionCache:
+    """Bounded LRU/TTL cache of per-session state with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self._entries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str, field: str) -> Tuple[bool, Any]:
+        """
+        Look up a cached field for a session.
+
+        Returns:
+            Tuple of (found, value); value is None when not found
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and field in entry:
+                self.hits += 1
+                return True, entry[field]
+            self.misses += 1
+            return False, None
+
+    def set(self, session_id: str, field: str, value: Any) -> None:
+        """Store a field for a session, refreshing the entry's TTL."""
+        with self._lock:
+            entry = dict(self._entries.get(session_id) or {})
+            entry[field] = value
+            self._entries[session_id] = entry
+
+    def invalidate(self, session_id: str, field: Optional[str] = None) -> None:
+        """Drop one field, or the whole entry when no field is given."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            if field is None:
+                del self._entries[session_id]
+            elif field in entry:
+                entry = dict(entry)
+                del entry[field]
+                self._entries[session_id] = entry
+
+    def upsert_saved_playlist(self, session_id: str, summary: Dict[str, Any]) -> None:
+        """Update the cached saved-playlist index after a playlist write."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or SAVED_PLAYLISTS not in entry:
+                return
+            index = [p for p in entry[SAVED_PLAYLISTS] if p.get("name") != summary.get("name")]
+            index.append(summary)
+            entry = dict(entry)
+            entry[SAVED_PLAYLISTS] = index
+            self._entries[session_id] = entry
+
+    def stats(self) -> Dict[str, Any]:
+        """Report cache size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self._entries.maxsize,
+                "ttl": self._entries.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache: Optional[SessionCache] = None
+
+
+def get_session_cache() -> SessionCache:
+    """Get the process-wide session cache."""
+    global _cache
+    if _cache is None:
+        _cache = SessionCache(
+            maxsize=int(os.getenv("SESSION_CACHE_MAX_SIZE", "1024")),
+            ttl=float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300"))
+        )
+    return _cache
@@ -0,0 +1,161 @@
+"""
+state_codec.py - Single-pass serialization of PlanningAgentState
+
+A finished turn's state is encoded once with orjson. The same bytes are
+embedded in the HTTP response (as an orjson.Fragment) and, zlib-compressed,
+stored as the session's Firestore blob. Only the fields declared on
+PlanningAgentState are encoded, minus the track table and result track
+aggregate (step results carry track_uris; the tracks themselves live in
+the Firestore `tracks` collection) and the incoming history (the stored state *is* the history,
+so including it would nest every previous turn). A value orjson can't
+represent is logged and stored as null rather than stringified.
+
+Each field is encoded separately and the object is assembled from the
+parts, so per-field sizes come for free; StateSizeStats keeps a histogram
+of them per key to show which fields are bloating documents.
+"""
+import os
+import zlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, get_type_hints
+
+import orjson
+
+from state import PlanningAgentState
+
+logger = logging.getLogger(__name__)
+
+# Explicit schema: the fields a serialized state may contain, in declaration order
+STATE_FIELDS: List[str] = list(get_type_hints(PlanningAgentState))
+
+# Fields left out of encoded states: track dicts are stored once per track,
+# and the previous turn's state must not nest inside the next one
+UNPERSISTED_FIELDS = {"tracks", "result_tracks", "history"}
+PERSISTED_FIELDS: List[str] = [field for field in STATE_FIELDS if field not in UNPERSISTED_FIELDS]
+
+# Firestore field values tagging how a stored state blob is encoded
+BLOB_ENCODING = "orjson+zlib"
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Upper bounds of the size histogram buckets, in bytes
+SIZE_BUCKETS = [256, 1024, 4096, 16384, 65536, 262144, 1048576]
+
+
+def _default(value: Any) -> Any:
+    """Encode the few non-JSON types that show up in tool results."""
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def project_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """The persisted schema fields present on a state, in schema order."""
+    return {field: state[field] for field in PERSISTED_FIELDS if field in state}
+
+
+class EncodedState:
+    """A state encoded as JSON bytes, with the encoded size of each field."""
+
+    def __init__(self, state: Dict[str, Any]):
+        self.sizes: Dict[str, int] = {}
+        parts = []
+        for field, value in project_state(state).items():
+            try:
+                encoded = orjson.dumps(value, default=_default, option=ORJSON_OPTIONS)
+            except TypeError as e:
+                logger.warning(f"State field '{field}' is not serializable, storing null: {e}")
+                encoded = b"null"
+            self.sizes[field] = len(encoded)
+            parts.append(b'"' + field.encode() + b'":' + encoded)
+        self.json = b"{" + b",".join(parts) + b"}"
+        self._blob: Optional[bytes] = None
+
+    def fragment(self) -> orjson.Fragment:
+        """The encoded state, for embedding in an orjson-rendered response."""
+        return orjson.Fragment(self.json)
+
+    def blob(self) -> bytes:
+        """The encoded state compressed for storage."""
+        if self._blob is None:
+            level = int(os.getenv("STATE_BLOB_COMPRESSION_LEVEL", "6"))
+            self._blob = zlib.compress(self.json, level)
+        return self._blob
+
+
+def encode_state(state: Dict[str, Any]) -> EncodedState:
+    """Encode a state once for both the response and storage."""
+    return EncodedState(state)
+
+
+def decode_state_blob(blob: bytes) -> Dict[str, Any]:
+    """Decode a stored state blob."""
+    return orjson.loads(zlib.decompress(blob))
+
+
+def dumps(value: Any) -> bytes:
+    """orjson encoding with the options used for responses."""
+    return orjson.dumps(value, default=_default, option=ORJSON_OPTIONS)
+
+
+class SizeHistogram:
+    """Counts of sizes per bucket, with totals."""
+
+    def __init__(self):
+        self.counts = [0] * (len(SIZE_BUCKETS) + 1)
+        self.total = 0
+        self.max = 0
+
+    def add(self, size: int) -> None:
+        index = next((i for i, bound in enumerate(SIZE_BUCKETS) if size <= bound), len(SIZE_BUCKETS))
+        self.counts[index] += 1
+        self.total += size
+        self.max = max(self.max, size)
+
+    def report(self) -> Dict[str, Any]:
+        samples = sum(self.counts)
+        labels = [f"<={bound}" for bound in SIZE_BUCKETS] + [f">{SIZE_BUCKETS[-1]}"]
+        return {
+            "samples": samples,
+            "mean_bytes": self.total / samples if samples else 0.0,
+            "max_bytes": self.max,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class StateSizeStats:
+    """Per-field and whole-document size histograms of encoded states."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fields: Dict[str, SizeHistogram] = {}
+        self._document = SizeHistogram()
+        self._compressed = SizeHistogram()
+
+    def record(self, encoded: EncodedState) -> None:
+        with self._lock:
+            for field, size in encoded.sizes.items():
+                self._fields.setdefault(field, SizeHistogram()).add(size)
+            self._document.add(len(encoded.json))
+            self._compressed.add(len(encoded.blob()))
+
+    def stats(self) -> Dict[str, Any]:
+        """Report histograms, fields ordered by mean size, largest first."""
+        with self._lock:
+            fields = {field: histogram.report() for field, histogram in self._fields.items()}
+            return {
+                "document": self._document.report(),
+                "compressed": self._compressed.report(),
+                "fields": dict(sorted(fields.items(), key=lambda item: -item[1]["mean_bytes"])),
+            }
+
+
+_size_stats = StateSizeStats()
+
+
+def get_state_size_stats() -> StateSizeStats:
+    """Get the process-wide state size histograms."""
+    return _size_stats
@@ -0,0 +1,169 @@
+"""
+track_store.py - URI-keyed track table
+
+Track dicts are stored once, keyed by Spotify URI. During a graph run the
+table lives in the state's `tracks` field (merged by the merge_tracks
+reducer); step results and pending actions carry `track_uris` lists that
+are resolved against it when full track dicts are needed. The state's
+`result_tracks` field is the deduplicated aggregate of every result track:
+the executor adds each step's tracks as it completes, so reading all of a
+run's tracks doesn't rescan step_results.
+
+In Firestore the same table is the `tracks` collection. The last result
+playlist and saved playlists store only URIs, and each track document is
+written once per process: TrackTableCache remembers which tracks are
+already persisted and serves reads of them without a round trip.
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+TrackTable = Dict[str, Dict[str, Any]]
+
+
+def intern_tracks(tracks: List[Dict[str, Any]]) -> Tuple[List[str], TrackTable]:
+    """
+    Split track dicts into their URIs and table entries.
+
+    Tracks without a URI can't be referenced and are dropped.
+    """
+    uris: List[str] = []
+    table: TrackTable = {}
+    for track in tracks:
+        uri = track.get("uri") if isinstance(track, dict) else None
+        if uri:
+            uris.append(uri)
+            table[uri] = track
+    return uris, table
+
+
+def resolve_tracks(uris: List[str], table: TrackTable) -> List[Dict[str, Any]]:
+    """Track dicts for a list of URIs, skipping any the table doesn't have."""
+    return [table[uri] for uri in uris if uri in table]
+
+
+def intern_result(result: Any) -> Tuple[Any, TrackTable]:
+    """
+    Replace a tool result's track list with its URIs.
+
+    Returns:
+        Tuple of (result with track_uris instead of tracks, new table entries)
+    """
+    if not isinstance(result, dict) or not isinstance(result.get("tracks"), list):
+        return result, {}
+    uris, table = intern_tracks(result["tracks"])
+    interned = {key: value for key, value in result.items() if key != "tracks"}
+    interned["track_uris"] = uris
+    return interned, table
+
+
+def intern_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Tool args with a materialized track list replaced by its URIs."""
+    if not isinstance(args.get("tracks"), list):
+        return args
+    interned = {key: value for key, value in args.items() if key != "tracks"}
+    interned["track_uris"], _ = intern_tracks(args["tracks"])
+    return interned
+
+
+def result_tracks(result: Any, table: TrackTable) -> List[Dict[str, Any]]:
+    """Track dicts referenced by a step result, empty if it has none."""
+    if not isinstance(result, dict):
+        return []
+    if "track_uris" in result:
+        return resolve_tracks(result["track_uris"], table)
+    # Results stored before tracks were interned
+    tracks = result.get("tracks")
+    return tracks if isinstance(tracks, list) else []
+
+
+def result_uris(result: Any) -> List[str]:
+    """URIs of the tracks in an interned step result, empty if it has none."""
+    if not isinstance(result, dict):
+        return []
+    return result.get("track_uris") or []
+
+
+def aggregate_tracks(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Every track the run's step results produced, deduplicated, in step order."""
+    return list((state.get("result_tracks") or {}).values())
+
+
+class TrackTableCache:
+    """Bounded LRU of tracks known to be persisted, with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 20000):
+        self._tracks: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.written = 0
+
+    def get_many(self, uris: List[str]) -> Tuple[TrackTable, List[str]]:
+        """
+        Look up tracks by URI.
+
+        Returns:
+            Tuple of (found tracks, URIs that were not cached)
+        """
+        found: TrackTable = {}
+        missing: List[str] = []
+        with self._lock:
+            for uri in dict.fromkeys(uris):
+                track = self._tracks.get(uri)
+                if track is None:
+                    missing.append(uri)
+                else:
+                    found[uri] = track
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def add(self, table: TrackTable) -> None:
+        """Remember tracks that were read from storage."""
+        with self._lock:
+            self._tracks.update(table)
+
+    def claim_unwritten(self, table: TrackTable) -> TrackTable:
+        """Mark tracks as persisted and return the ones that still need writing."""
+        with self._lock:
+            unwritten = {uri: track for uri, track in table.items() if uri not in self._tracks}
+            self._tracks.update(unwritten)
+            self.written += len(unwritten)
+        return unwritten
+
+    def forget(self, uris: List[str]) -> None:
+        """Drop tracks whose write did not go through."""
+        with self._lock:
+            for uri in uris:
+                self._tracks.pop(uri, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report cache size and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._tracks),
+                "written": self.written,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_track_cache: Optional[TrackTableCache] = None
+_track_cache_lock = threading.Lock()
+
+
+def get_track_table_cache() -> TrackTableCache:
+    """Get the process-wide persisted-track cache."""
+    global _track_cache
+    if _track_cache is None:
+        with _track_cache_lock:
+            if _track_cache is None:
+                _track_cache = TrackTableCache(
+                    maxsize=int(os.getenv("TRACK_TABLE_CACHE_SIZE", "20000"))
+                )
+    return _track_cache
@@ -0,0 +1,153 @@
+"""
+Write-behind batching for end-of-turn Firestore writes.
+
+The mutations a request makes after the graph finishes (playlist, new
+track documents, history) are staged into one SessionWriteBatch and
+committed as Firestore WriteBatches in the background, so the HTTP
+response doesn't wait on them. Commits for the same session run in
+submission order, and flush() drains everything on shutdown.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from storage.session_cache import SessionCache, HISTORY, LAST_PLAYLIST
+from storage.state_codec import EncodedState, BLOB_ENCODING
+from storage.track_store import TrackTable, intern_tracks, get_track_table_cache
+
+# Firestore caps a WriteBatch at 500 operations
+MAX_BATCH_OPERATIONS = 500
+
+logger = logging.getLogger(__name__)
+
+
+class SessionWriteBatch:
+    """
+    Mutations staged for one session during one request.
+
+    Staging a write updates the session cache immediately, so reads served
+    by this worker see the new values before the batch is committed.
+    """
+
+    def __init__(self, store, session_id: str):
+        self._store = store
+        self.session_id = session_id
+        self.operations: List[Tuple[str, Any, Optional[Dict[str, Any]], bool]] = []
+        self.track_uris: List[str] = []  # Track documents staged by this batch
+
+    @property
+    def _cache(self) -> SessionCache:
+        return self._store.cache
+
+    def _set(self, doc_ref, data: Dict[str, Any], merge: bool = False) -> None:
+        self.operations.append(("set", doc_ref, data, merge))
+
+    def _delete(self, doc_ref) -> None:
+        self.operations.append(("delete", doc_ref, None, False))
+
+    def save_history(self, history: Any, encoded: EncodedState) -> None:
+        """Replace the stored conversation history with its compressed encoding."""
+        self._set(
+            self._store._history_ref(self.session_id),
+            {'state': encoded.blob(), 'encoding': BLOB_ENCODING}
+        )
+        self._cache.set(self.session_id, HISTORY, history)
+
+    def save_tracks(self, table: TrackTable) -> None:
+        """Write track documents that haven't been persisted yet."""
+        unwritten = get_track_table_cache().claim_unwritten(table)
+        for uri, track in unwritten.items():
+            self._set(self._store._track_ref(uri), track)
+        self.track_uris.extend(unwritten)
+
+    def save_last_playlist(self, playlist: List[Dict]) -> None:
+        """Store the most recent result playlist on the session document as URIs."""
+        uris, table = intern_tracks(playlist)
+        self.save_tracks(table)
+        self._set(self._store._playlist_ref(self.session_id), {'track_uris': uris}, merge=True)
+        self._cache.set(self.session_id, LAST_PLAYLIST, playlist)
+
+    def save_playlist(self, playlist_name: str, document: Dict[str, Any]) -> None:
+        """Create or replace a saved playlist document."""
+        self._set(self._store._saved_playlists_ref(self.session_id).document(playlist_name), document)
+        self._cache.upsert_saved_playlist(self.session_id, {
+            "name": document.get("name", playlist_name),
+            "track_count": document.get("track_count", 0),
+            "description": document.get("description", "")
+        })
+
+    def rollback(self) -> None:
+        """Drop cached values after a failed commit; Firestore never received them."""
+        self._cache.invalidate(self.session_id)
+        get_track_table_cache().forget(self.track_uris)
+
+    async def commit(self) -> None:
+        """Commit all staged operations in Firestore WriteBatches of up to 500."""
+        if not self.operations:
+            return
+
+        # Track documents are staged before the documents that reference
+        # them, so splitting at the batch limit keeps them in order
+        for start in range(0, len(self.operations), MAX_BATCH_OPERATIONS):
+            batch = self._store.db.batch()
+            for op, doc_ref, data, merge in self.operations[start:start + MAX_BATCH_OPERATIONS]:
+                if op == "set":
+                    batch.set(doc_ref, data, merge=merge)
+                else:
+                    batch.delete(doc_ref)
+            await batch.commit()
+        logger.debug(f"Committed {len(self.operations)} writes for {self.session_id}")
+
+
+class WriteBehindWriter:
+    """Commits session write batches in the background, ordered per session."""
+
+    def __init__(self, cache: SessionCache):
+        self._cache = cache
+        self._tails: Dict[str, asyncio.Task] = {}
+        self.committed = 0
+        self.failed = 0
+
+    def submit(self, batch: SessionWriteBatch) -> asyncio.Task:
+        """Schedule a batch to commit after any earlier batch for the session."""
+        session_id = batch.session_id
+        previous = self._tails.get(session_id)
+        task = asyncio.create_task(self._commit_after(previous, batch))
+        self._tails[session_id] = task
+        task.add_done_callback(lambda t: self._release(session_id, t))
+        return task
+
+    async def _commit_after(self, previous: Optional[asyncio.Task], batch: SessionWriteBatch) -> None:
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            await batch.commit()
+            self.committed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error committing writes for {batch.session_id}: {e}")
+            # The cache holds values Firestore never received; drop them
+            batch.rollback()
+
+    def _release(self, session_id: str, task: asyncio.Task) -> None:
+        if self._tails.get(session_id) is task:
+            del self._tails[session_id]
+
+    async def wait_for(self, session_id: str) -> None:
+        """Wait until pending writes for a session have been committed."""
+        task = self._tails.get(session_id)
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def flush(self) -> None:
+        """Wait for every pending batch to commit."""
+        while self._tails:
+            await asyncio.gather(*list(self._tails.values()), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report pending and completed batch counters."""
+        return {
+            "pending_sessions": len(self._tails),
+            "committed": self.committed,
+            "failed": self.failed,
+        }
@@ -0,0 +1,70 @@
+"""Routed memory intents run through the executor end to end."""
+import asyncio
+
+import pytest
+
+from nodes import router
+from nodes.executor import executor_node
+from tools import planning_tools
+
+SESSION_ID = "session-1"
+TRACK = {"uri": "spotify:track:1", "name": "Song", "artist": "Artist"}
+
+
+class FakeSessionStore:
+    """In-memory stand-in for FirestoreSessionStore, keyed by session."""
+
+    def __init__(self):
+        self.saved = {SESSION_ID: {"Workout": {"name": "Workout", "tracks": [TRACK], "track_count": 1}}}
+        self.last = {SESSION_ID: [TRACK]}
+
+    async def get_last_playlist(self, session_id):
+        return self.last.get(session_id, [])
+
+    async def list_saved_playlists(self, session_id):
+        return list(self.saved.get(session_id, {}).values())
+
+    async def get_saved_playlist(self, session_id, playlist_name):
+        return self.saved.get(session_id, {}).get(playlist_name)
+
+    async def save_playlist(self, session_id, playlist_name, playlist_data):
+        self.saved.setdefault(session_id, {})[playlist_name] = playlist_data
+
+
+@pytest.fixture
+def store(monkeypatch):
+    fake = FakeSessionStore()
+    monkeypatch.setattr(router, "get_session_store", lambda: fake)
+    monkeypatch.setattr(planning_tools, "get_session_store", lambda: fake)
+    return fake
+
+
+def run_routed(query):
+    state = {"query": query, "session_id": SESSION_ID, "tracks": {}, "step_results": {}}
+    state.update(asyncio.run(router.router_node(state)))
+    assert state["plan"], f"'{query}' was not routed"
+    return asyncio.run(executor_node(state))
+
+
+def test_list_playlists(store):
+    update = run_routed("list my playlists")
+
+    assert update["execution_complete"]
+    assert "needs_replan" not in update
+    assert update["last_tool_result"]["count"] == 1
+
+
+def test_show_playlist(store):
+    update = run_routed("show me my workout playlist")
+
+    assert update["execution_complete"]
+    assert "needs_replan" not in update
+    assert update["last_tool_result"]["playlist_name"] == "Workout"
+
+
+def test_save_last(store):
+    update = run_routed("save this as Road Trip")
+
+    assert update["execution_complete"]
+    assert "needs_replan" not in update
+    assert store.saved[SESSION_ID]["Road Trip"]["tracks"] == [TRACK]
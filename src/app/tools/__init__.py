@@ -9,8 +9,19 @@ from tools.planning_tools import (
     TOOLS,
     TOOL_REGISTRY,
 )
-from tools.spotify_tools import create_spotify_client, search_tracks, create_playlist
+from tools.spotify_tools import (
+    create_spotify_client,
+    get_spotify_client,
+    close_spotify_client,
+    search_tracks,
+    create_playlist,
+)
 from tools.llm_tools import extract_json_from_llm_response
+from tools.runtime import ToolRuntime, get_tool_runtime
+from tools.search_cache import SearchCache, get_search_cache
+from tools.track_catalog import TrackCatalog, get_track_catalog
+from tools.track_batch import TrackBatch
+from tools.spotify_scheduler import SpotifyRequestScheduler, get_spotify_scheduler
 
 __all__ = [
     # Planning tools
@@ -22,8 +33,22 @@ __all__ = [
     "TOOL_REGISTRY",
     # Spotify utilities
     "create_spotify_client",
+    "get_spotify_client",
+    "close_spotify_client",
     "search_tracks",
     "create_playlist",
+    "SpotifyRequestScheduler",
+    "get_spotify_scheduler",
     # LLM utilities
     "extract_json_from_llm_response",
+    # Tool execution
+    "ToolRuntime",
+    "get_tool_runtime",
+    # Search caching
+    "SearchCache",
+    "get_search_cache",
+    "TrackCatalog",
+    "get_track_catalog",
+    # Columnar track operations
+    "TrackBatch",
 ]
@@ -4,13 +4,14 @@ planning_tools.py - Tool definitions for the Planning Agent
 These tools are used by the executor to perform actions based on the planner's decisions.
 """
 import os
-from typing import List, Dict, Optional, Any
+from typing import Annotated, List, Dict, Optional, Any
 from pydantic import BaseModel, Field
-from langchain_core.tools import tool
-import firebase_admin
-from firebase_admin import firestore
+from langchain_core.tools import InjectedToolArg, tool
 
-from .spotify_tools import create_spotify_client, search_tracks as spotify_search, create_playlist as spotify_create_playlist
+from storage.firestore_store import get_session_store
+from .search_cache import get_search_cache, make_search_key
+from .track_catalog import get_track_catalog, is_local_first, local_min_hits
+from .spotify_tools import get_spotify_client, search_tracks as spotify_search, create_playlist as spotify_create_playlist
 
 
 # ============================================================================
@@ -29,12 +30,14 @@ class CommitPlaylistInput(BaseModel):
     playlist_name: str = Field(description="Name for the playlist")
     tracks: List[Dict[str, Any]] = Field(description="List of track objects to save")
     description: Optional[str] = Field(default="", description="Optional playlist description")
+    session_id: Annotated[str, InjectedToolArg] = Field(default="", description="Session to save under; injected by the executor")
 
 
 class ReadPlaylistInput(BaseModel):
     """Input schema for reading playlist from memory."""
     playlist_name: Optional[str] = Field(default=None, description="Name of specific playlist to retrieve")
     list_all: bool = Field(default=False, description="If true, list all saved playlists instead of retrieving one")
+    session_id: Annotated[str, InjectedToolArg] = Field(default="", description="Session to read from; injected by the executor")
 
 
 class SaveToSpotifyInput(BaseModel):
@@ -62,8 +65,27 @@ def search_spotify(query: str, limit: int = 10, max_year: Optional[int] = None)
     Returns a dictionary with track information including name, artist, album, and URI.
     """
     try:
-        client = create_spotify_client()
-        tracks = spotify_search(client, query, limit, max_year)
+        cache = get_search_cache()
+        cache_key = make_search_key(query, limit, max_year)
+        tracks = cache.get(cache_key)
+
+        catalog = get_track_catalog()
+        if tracks is None and catalog is not None and is_local_first():
+            # Answer from the local index when it has enough matches
+            local_tracks = catalog.search(query, limit, max_year)
+            enough = len(local_tracks) >= local_min_hits(limit)
+            catalog.record_lookup(enough)
+            if enough:
+                tracks = local_tracks
+
+        if tracks is None:
+            client = get_spotify_client()
+            tracks = spotify_search(client, query, limit, max_year)
+            if tracks:
+                cache.set(cache_key, tracks)
+                if catalog is not None:
+                    catalog.add_tracks(tracks)
+
         return {
             "success": True,
             "query": query,
@@ -79,7 +101,7 @@ def search_spotify(query: str, limit: int = 10, max_year: Optional[int] = None)
 
 
 @tool(args_schema=CommitPlaylistInput)
-def commit_playlist_to_memory(
+async def commit_playlist_to_memory(
     playlist_name: str,
     tracks: List[Dict[str, Any]],
     description: str = "",
@@ -102,11 +124,7 @@ def commit_playlist_to_memory(
                 "error": "Session ID is required to save playlist to memory"
             }
 
-        db = firestore.client()
-
         # Store in playlists collection under session_id
-        doc_ref = db.collection('playlists').document(session_id).collection('saved_playlists').document(playlist_name)
-
         playlist_data = {
             "name": playlist_name,
             "tracks": tracks,
@@ -114,7 +132,7 @@ def commit_playlist_to_memory(
             "track_count": len(tracks)
         }
 
-        doc_ref.set(playlist_data)
+        await get_session_store().save_playlist(session_id, playlist_name, playlist_data)
 
         return {
             "success": True,
@@ -130,7 +148,7 @@ def commit_playlist_to_memory(
 
 
 @tool(args_schema=ReadPlaylistInput)
-def read_playlist_from_memory(
+async def read_playlist_from_memory(
     playlist_name: Optional[str] = None,
     list_all: bool = False,
     session_id: str = ""
@@ -152,20 +170,11 @@ def read_playlist_from_memory(
                 "error": "Session ID is required to read playlists from memory"
             }
 
-        db = firestore.client()
-        collection_ref = db.collection('playlists').document(session_id).collection('saved_playlists')
+        store = get_session_store()
 
         if list_all:
             # List all saved playlists
-            docs = collection_ref.stream()
-            playlists = []
-            for doc in docs:
-                data = doc.to_dict()
-                playlists.append({
-                    "name": data.get("name", doc.id),
-                    "track_count": data.get("track_count", 0),
-                    "description": data.get("description", "")
-                })
+            playlists = await store.list_saved_playlists(session_id)
 
             return {
                 "success": True,
@@ -180,16 +189,14 @@ def read_playlist_from_memory(
                     "error": "Please provide a playlist name or set list_all=True"
                 }
 
-            doc_ref = collection_ref.document(playlist_name)
-            doc = doc_ref.get()
+            data = await store.get_saved_playlist(session_id, playlist_name)
 
-            if not doc.exists:
+            if data is None:
                 return {
                     "success": False,
                     "error": f"Playlist '{playlist_name}' not found"
                 }
 
-            data = doc.to_dict()
             return {
                 "success": True,
                 "playlist_name": playlist_name,
@@ -223,20 +230,18 @@ def save_playlist_to_spotify(
     Returns success confirmation with Spotify playlist URL.
     """
     try:
-        client = create_spotify_client()
+        client = get_spotify_client()
 
         # Create playlist on Spotify
-        result = spotify_create_playlist(
+        playlist = spotify_create_playlist(
             client=client,
             tracks=tracks,
             name=playlist_name,
             description=description
         )
 
-        # Get the playlist URL
-        user_id = client.me()['id']
-        playlists = client.user_playlists(user_id, limit=1)
-        playlist_url = playlists['items'][0]['external_urls']['spotify'] if playlists['items'] else None
+        # The create response already carries the playlist URL
+        playlist_url = playlist.get('external_urls', {}).get('spotify')
 
         return {
             "success": True,
@@ -0,0 +1,148 @@
+"""
+runtime.py - Async execution of planning tools
+
+Every tool call from the executor goes through the ToolRuntime so that no
+tool ever runs on the event loop thread:
+- Tools with a native coroutine are awaited directly
+- Blocking tools (Spotipy HTTP calls) are offloaded to a bounded thread pool
+
+Each tool also gets its own concurrency limit and call timings, so one slow
+Spotify search only queues behind other searches, not unrelated sessions.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default number of concurrent calls allowed per tool.
+# Override with TOOL_CONCURRENCY_<TOOL_NAME>, e.g. TOOL_CONCURRENCY_SEARCH_SPOTIFY=16
+DEFAULT_TOOL_CONCURRENCY = {
+    "search_spotify": 8,
+    "commit_playlist_to_memory": 16,
+    "read_playlist_from_memory": 16,
+    "save_playlist_to_spotify": 2,
+}
+
+
+class ToolStats:
+    """Call counters and latency samples for one tool."""
+
+    def __init__(self, window: int = 256):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, elapsed_ms: float) -> None:
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self._recent.append(elapsed_ms)
+
+    def percentile(self, pct: float) -> float:
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "avg_ms": self.total_ms / self.calls if self.calls else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": self.max_ms,
+        }
+
+
+class ToolRuntime:
+    """Runs tools off the event loop with per-tool limits and timings."""
+
+    def __init__(self, max_workers: int = 16, timeout: Optional[float] = 30.0):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._timeout = timeout
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, ToolStats] = {}
+
+    def _limit_for(self, tool_name: str) -> asyncio.Semaphore:
+        if tool_name not in self._limits:
+            default = DEFAULT_TOOL_CONCURRENCY.get(tool_name, 8)
+            limit = int(os.getenv(f"TOOL_CONCURRENCY_{tool_name.upper()}", str(default)))
+            self._limits[tool_name] = asyncio.Semaphore(limit)
+        return self._limits[tool_name]
+
+    def _stats_for(self, tool_name: str) -> ToolStats:
+        if tool_name not in self._stats:
+            self._stats[tool_name] = ToolStats()
+        return self._stats[tool_name]
+
+    async def _call(self, tool, tool_args: Dict[str, Any]) -> Any:
+        # Native async tools are awaited on the loop; sync tools go to the pool
+        if getattr(tool, "coroutine", None) is not None:
+            return await tool.ainvoke(tool_args)
+
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._pool, partial(context.run, tool.invoke, tool_args))
+
+    async def ainvoke(self, tool_name: str, tool, tool_args: Dict[str, Any]) -> Any:
+        """Invoke a tool without blocking the event loop."""
+        stats = self._stats_for(tool_name)
+
+        stats.queued += 1
+        async with self._limit_for(tool_name):
+            stats.queued -= 1
+            stats.in_flight += 1
+            start = time.perf_counter()
+            try:
+                return await asyncio.wait_for(self._call(tool, tool_args), timeout=self._timeout)
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                logger.warning(f"Tool {tool_name} timed out after {self._timeout}s")
+                raise
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.in_flight -= 1
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                stats.record(elapsed_ms)
+                logger.debug(f"Tool {tool_name} took {elapsed_ms:.1f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        """Report per-tool call counters and latencies."""
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def shutdown(self) -> None:
+        """Stop the worker threads once in-flight calls finish."""
+        self._pool.shutdown(wait=True)
+
+
+_runtime: Optional[ToolRuntime] = None
+
+
+def get_tool_runtime() -> ToolRuntime:
+    """Get the process-wide tool runtime."""
+    global _runtime
+    if _runtime is None:
+        timeout = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+        _runtime = ToolRuntime(
+            max_workers=int(os.getenv("TOOL_THREAD_POOL_SIZE", "16")),
+            timeout=timeout if timeout > 0 else None
+        )
+    return _runtime
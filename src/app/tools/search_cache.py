@@ -0,0 +1,116 @@
+"""
+search_cache.py - Result cache for search_spotify
+
+Searches are keyed on a normalized query (case, whitespace and token order
+are ignored) plus limit and max_year. Entries live in an in-memory LRU with
+a TTL and, when SEARCH_CACHE_SQLITE_PATH is set, in an on-disk SQLite
+table that survives restarts.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import List, Dict, Optional, Any
+
+from cachetools import TTLCache
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query so near-identical searches share a key."""
+    return " ".join(sorted(query.lower().split()))
+
+
+def make_search_key(query: str, limit: int, max_year: Optional[int] = None) -> str:
+    """Build the cache key for a search."""
+    return f"{normalize_query(query)}|{limit}|{max_year or ''}"
+
+
+class SearchCache:
+    """Two-level (memory, optional SQLite) cache of search results."""
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 3600.0, sqlite_path: Optional[str] = None):
+        self._ttl = ttl
+        self._memory: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, tracks TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM search_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """Get cached tracks for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self.memory_hits += 1
+                return entry[1]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT tracks, expires_at FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    tracks = json.loads(row[0])
+                    self._memory[key] = (row[1], tracks)
+                    self.disk_hits += 1
+                    return tracks
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, tracks: List[Dict]) -> None:
+        """Store tracks for a key in every cache level."""
+        expires_at = time.time() + self._ttl
+        with self._lock:
+            self._memory[key] = (expires_at, tracks)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, tracks, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(tracks), expires_at)
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Report cache size and hit rates."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "size": len(self._memory),
+                "maxsize": self._memory.maxsize,
+                "ttl": self._ttl,
+                "sqlite": self._db is not None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Get the process-wide search cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SearchCache(
+                    maxsize=int(os.getenv("SEARCH_CACHE_MAX_SIZE", "2048")),
+                    ttl=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600")),
+                    sqlite_path=os.getenv("SEARCH_CACHE_SQLITE_PATH") or None
+                )
+    return _cache
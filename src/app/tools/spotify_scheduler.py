@@ -0,0 +1,199 @@
+"""
+spotify_scheduler.py - Central scheduler for Spotify Web API calls
+
+Every Spotify request goes through SpotifyRequestScheduler.call(), which:
+- Spaces requests with a token bucket sized to the app's quota
+- Pauses all callers for the Retry-After period when Spotify returns 429
+- Retries 5xx responses and connection errors with jittered backoff; for
+  non-idempotent writes (idempotent=False) only errors raised before the
+  request reached Spotify (429s, connect failures) are retried, since a
+  write that timed out may already have been applied
+- Coalesces identical concurrent requests (single-flight), so the same
+  search issued by several sessions at once costs one HTTP request
+
+Tool calls run on worker threads, so the scheduler is thread-based.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import requests
+import spotipy
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a fixed rate."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, returning how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+def never_sent(error: Exception) -> bool:
+    """Whether a transport error happened before the request reached Spotify."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class SpotifyRequestScheduler:
+    """Rate limiting, retries and single-flight coalescing for Spotify calls."""
+
+    def __init__(self, rate: float = 10.0, burst: float = 20.0, max_retries: int = 3, backoff: float = 0.5):
+        self._bucket = TokenBucket(rate, burst)
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._lock = threading.Lock()
+        self._blocked_until = 0.0
+        self._in_flight: Dict[Hashable, Future] = {}
+
+        self.queue_depth = 0
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.coalesced = 0
+
+    def call(
+        self,
+        fn: Callable,
+        *args,
+        key: Optional[Hashable] = None,
+        idempotent: bool = True,
+        **kwargs
+    ) -> Any:
+        """
+        Run a Spotify client call under the scheduler.
+
+        Args:
+            fn: Bound Spotipy method to call
+            key: Optional identity of the request; concurrent calls with the
+                same key share a single HTTP request and its result
+            idempotent: False for writes that must not be repeated (creating
+                a playlist, adding items); disables retries of 5xx responses
+                and errors that may have happened after the request was sent
+        """
+        if key is None:
+            return self._execute(fn, idempotent, *args, **kwargs)
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(self._execute(fn, idempotent, *args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+    def _wait_for_capacity(self) -> None:
+        with self._lock:
+            self.queue_depth += 1
+        try:
+            blocked_for = self._blocked_until - time.monotonic()
+            if blocked_for > 0:
+                time.sleep(blocked_for)
+            delay = self._bucket.reserve()
+            if delay > 0:
+                time.sleep(delay)
+        finally:
+            with self._lock:
+                self.queue_depth -= 1
+
+    def _retry_delay(self, attempt: int) -> float:
+        return self._backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def _execute(self, fn: Callable, idempotent: bool, *args, **kwargs) -> Any:
+        for attempt in range(self._max_retries + 1):
+            self._wait_for_capacity()
+            with self._lock:
+                self.requests += 1
+            try:
+                return fn(*args, **kwargs)
+            except spotipy.SpotifyException as e:
+                if attempt == self._max_retries:
+                    raise
+                if e.http_status == 429:
+                    retry_after = float((e.headers or {}).get('Retry-After', 1))
+                    with self._lock:
+                        self.throttled += 1
+                        self.retries += 1
+                        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                    logger.warning(f"Spotify rate limited; pausing requests for {retry_after}s")
+                elif e.http_status >= 500 and idempotent:
+                    with self._lock:
+                        self.retries += 1
+                    time.sleep(self._retry_delay(attempt))
+                else:
+                    raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # A write is only safe to resend if it never reached Spotify
+                if attempt == self._max_retries or not (idempotent or never_sent(e)):
+                    raise
+                with self._lock:
+                    self.retries += 1
+                logger.warning(f"Spotify request failed ({e}); retrying")
+                time.sleep(self._retry_delay(attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        """Report queue depth and throttling counters."""
+        with self._lock:
+            return {
+                "queue_depth": self.queue_depth,
+                "coalescing": len(self._in_flight),
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "coalesced": self.coalesced,
+                "blocked_for": max(0.0, self._blocked_until - time.monotonic()),
+            }
+
+
+_scheduler: Optional[SpotifyRequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_spotify_scheduler() -> SpotifyRequestScheduler:
+    """Get the process-wide Spotify request scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = SpotifyRequestScheduler(
+                    rate=float(os.getenv("SPOTIFY_RATE_LIMIT_PER_SECOND", "10")),
+                    burst=float(os.getenv("SPOTIFY_RATE_LIMIT_BURST", "20")),
+                    max_retries=int(os.getenv("SPOTIFY_MAX_RETRIES", "3"))
+                )
+    return _scheduler
@@ -2,10 +2,29 @@
 spotify_tools.py - Functional approach
 """
 import os
+import time
+import logging
+import threading
+import weakref
 from typing import List, Dict, Optional, Callable
 from functools import partial
+import requests
+from requests.adapters import HTTPAdapter
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from spotipy.cache_handler import CacheHandler, CacheFileHandler
+
+from .spotify_scheduler import get_spotify_scheduler
+from .track_batch import TrackBatch
+
+logger = logging.getLogger(__name__)
+
+# Spotify accepts at most 100 URIs per playlist_add_items call
+PLAYLIST_ADD_CHUNK_SIZE = 100
+
+# Authenticated user IDs, memoized per client
+_user_ids = weakref.WeakKeyDictionary()
+_user_id_lock = threading.Lock()
 
 def  get_spotify_assistant_message(messages: List[Dict]) -> str:
     """Extracts the content of the most recent message from the 'spotify_agent_assistant'.
@@ -28,6 +47,153 @@ def create_spotify_client() -> spotipy.Spotify:
         scope='playlist-modify-public'
     ))
 
+
+class SharedTokenCache(CacheHandler):
+    """
+    Process-wide in-memory token cache.
+
+    Seeded once from the token cache file, then served from memory. Refreshed
+    tokens are written back to the file so restarts keep a valid token.
+    """
+
+    def __init__(self, file_handler: Optional[CacheHandler] = None):
+        self._file_handler = file_handler
+        self._lock = threading.Lock()
+        self._token_info = None
+        self._loaded = False
+
+    def get_cached_token(self):
+        with self._lock:
+            if not self._loaded:
+                if self._file_handler is not None:
+                    self._token_info = self._file_handler.get_cached_token()
+                self._loaded = True
+            return self._token_info
+
+    def save_token_to_cache(self, token_info):
+        with self._lock:
+            self._token_info = token_info
+            self._loaded = True
+        if self._file_handler is not None:
+            self._file_handler.save_token_to_cache(token_info)
+
+
+class SharedSpotifyOAuth(SpotifyOAuth):
+    """SpotifyOAuth that serializes token validation and refresh across threads."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._token_lock = threading.RLock()
+
+    def get_access_token(self, *args, **kwargs):
+        with self._token_lock:
+            return super().get_access_token(*args, **kwargs)
+
+    def refresh_access_token(self, refresh_token):
+        with self._token_lock:
+            return super().refresh_access_token(refresh_token)
+
+
+def build_spotify_session(pool_size: int = 16) -> requests.Session:
+    """
+    Build a keep-alive HTTP session sized for concurrent tool threads.
+
+    Transport-level retries are disabled; retries and rate limiting are
+    handled by the Spotify request scheduler.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class SpotifyClientPool:
+    """
+    Long-lived Spotify client shared by every tool thread.
+
+    All calls reuse one keep-alive requests.Session and one in-memory token
+    cache. A background thread refreshes the access token before it expires
+    so no request pays for a refresh round trip.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 16,
+        refresh_margin: float = 300.0,
+        refresh_interval: float = 60.0
+    ):
+        self.session = build_spotify_session(pool_size)
+        self.token_cache = SharedTokenCache(CacheFileHandler())
+        self.auth_manager = SharedSpotifyOAuth(
+            client_id=os.getenv('SPOTIFY_CLIENT_ID'),
+            client_secret=os.getenv('SPOTIFY_CLIENT_SECRET'),
+            redirect_uri=os.getenv('SPOTIFY_REDIRECT_URI'),
+            scope='playlist-modify-public',
+            cache_handler=self.token_cache,
+            requests_session=self.session
+        )
+        self.client = spotipy.Spotify(
+            auth_manager=self.auth_manager,
+            requests_session=self.session,
+            requests_timeout=10
+        )
+        self._refresh_margin = refresh_margin
+        self._refresh_interval = refresh_interval
+        self._stop = threading.Event()
+        self._refresher = threading.Thread(
+            target=self._refresh_loop, name="spotify-token-refresh", daemon=True
+        )
+        self._refresher.start()
+
+    def refresh_if_expiring(self) -> None:
+        """Refresh the cached access token if it expires within the margin."""
+        token_info = self.token_cache.get_cached_token()
+        if not token_info or "refresh_token" not in token_info:
+            return
+        if token_info.get("expires_at", 0) - time.time() > self._refresh_margin:
+            return
+        self.auth_manager.refresh_access_token(token_info["refresh_token"])
+        logger.debug("Refreshed Spotify access token ahead of expiry")
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self._refresh_interval):
+            try:
+                self.refresh_if_expiring()
+            except Exception as e:
+                logger.warning(f"Background Spotify token refresh failed: {e}")
+
+    def close(self) -> None:
+        """Stop the refresher and close pooled connections."""
+        self._stop.set()
+        self.session.close()
+
+
+_pool: Optional[SpotifyClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_spotify_client() -> spotipy.Spotify:
+    """Get the process-wide pooled Spotify client."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SpotifyClientPool(
+                    pool_size=int(os.getenv('SPOTIFY_HTTP_POOL_SIZE', '16')),
+                    refresh_margin=float(os.getenv('SPOTIFY_TOKEN_REFRESH_MARGIN', '300'))
+                )
+    return _pool.client
+
+
+def close_spotify_client() -> None:
+    """Shut down the pooled Spotify client, if one was created."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
 def extract_track_info(track_item: Dict) -> Dict:
     """Extract relevant track information from Spotify track item."""
     return {
@@ -35,15 +201,14 @@ def extract_track_info(track_item: Dict) -> Dict:
         'uri': track_item['uri'],
         'artist': track_item['artists'][0]['name'],
         'album': track_item['album']['name'],
-        'release_date': track_item['album']['release_date']
+        'release_date': track_item['album']['release_date'],
+        'popularity': track_item.get('popularity'),
+        'duration_ms': track_item.get('duration_ms')
     }
 
 def filter_by_year(tracks: List[Dict], max_year: int) -> List[Dict]:
     """Filter tracks by release year."""
-    return list(filter(
-        lambda track: int(track['release_date'][:4]) <= max_year,
-        tracks
-    ))
+    return TrackBatch.from_dicts(tracks).filter_years(max_year=max_year).to_dicts()
 
 def search_tracks(
     client: spotipy.Spotify,
@@ -53,13 +218,20 @@ def search_tracks(
 ) -> List[Dict]:
     """Search for tracks based on a keyword."""
     print(f"Searching for tracks with keyword: {keyword}")
-    results = client.search(q=keyword, type='track', limit=limit * 2)
-    tracks = list(map(extract_track_info, results['tracks']['items']))
+    # Identical concurrent searches share one request
+    results = get_spotify_scheduler().call(
+        client.search,
+        q=keyword,
+        type='track',
+        limit=limit * 2,
+        key=('search', keyword, limit * 2)
+    )
+    batch = TrackBatch.from_dicts(map(extract_track_info, results['tracks']['items']))
     
     if max_year:
-        tracks = filter_by_year(tracks, max_year)
+        batch = batch.filter_years(max_year=max_year)
     
-    return tracks[:limit]
+    return batch.dedup()[:limit].to_dicts()
 
 def format_track_display(track: Dict, index: int) -> str:
     """Format track information for display."""
@@ -71,6 +243,35 @@ def display_tracks(tracks: List[Dict]) -> None:
     for idx, track in enumerate(tracks, 1):
         print(format_track_display(track, idx))
 
+def get_current_user_id(client: spotipy.Spotify) -> str:
+    """Get the authenticated user's ID, fetching the profile once per client."""
+    with _user_id_lock:
+        user_id = _user_ids.get(client)
+    if user_id is None:
+        user_id = get_spotify_scheduler().call(client.me)['id']
+        with _user_id_lock:
+            _user_ids[client] = user_id
+    return user_id
+
+def add_tracks_in_chunks(
+    client: spotipy.Spotify,
+    playlist_id: str,
+    track_uris: List[str],
+    chunk_size: int = PLAYLIST_ADD_CHUNK_SIZE
+) -> None:
+    """
+    Add tracks to a playlist in order, in chunks of Spotify's per-call limit.
+
+    Rate limiting for each chunk is handled by the scheduler. Chunks are
+    sent as non-idempotent writes, so one that may already have been added
+    is not resent.
+    """
+    scheduler = get_spotify_scheduler()
+    for start in range(0, len(track_uris), chunk_size):
+        chunk = track_uris[start:start + chunk_size]
+        scheduler.call(client.playlist_add_items, playlist_id, chunk, idempotent=False)
+        logger.debug(f"Added tracks {start + 1}-{start + len(chunk)} of {len(track_uris)}")
+
 def create_playlist(
     client: spotipy.Spotify,
     tracks,
@@ -81,24 +282,20 @@ def create_playlist(
     Create a playlist with the given tracks.
     
     Combines all tracks into a single playlist, removing duplicates.
-    Returns the playlist name.
+    Returns the playlist object from Spotify's create response.
     """
-    print("Fetching user ID...")
-    user_id = client.me()['id']
-    print(f"User ID fetched: {user_id}")
+    user_id = get_current_user_id(client)
     
     print(f"Creating playlist with name: {name} and description: {description}...")
-    playlist = client.user_playlist_create(
+    playlist = get_spotify_scheduler().call(
+        client.user_playlist_create,
+        idempotent=False,
         user=user_id,
         name=name,
         description=description
     )
     print(f"Playlist created with ID: {playlist['id']}")
     
-    # Get unique track URIs
-    track_uris = []
-    seen_uris = set()
-    
     print("Processing tracks to remove duplicates...")
     if isinstance(tracks, dict):
         # Flatten dictionary of tracks into single list
@@ -108,24 +305,21 @@ def create_playlist(
         all_tracks = tracks
         print(f"Tracks provided as list. Total tracks: {len(all_tracks)}")
     
-    # Add unique tracks
-    for track in all_tracks:
-        if track['uri'] not in seen_uris:
-            track_uris.append(track['uri'])
-            seen_uris.add(track['uri'])
+    # Get unique track URIs
+    track_uris = TrackBatch.from_dicts(all_tracks).dedup().uri_list()
     print(f"Unique tracks identified. Total unique tracks: {len(track_uris)}")
     
     print(f"Adding tracks to playlist with ID: {playlist['id']}...")
-    client.playlist_add_items(playlist['id'], track_uris)
+    add_tracks_in_chunks(client, playlist['id'], track_uris)
     print("Tracks added successfully.")
     
-    return name
+    return playlist
 
 
 # Create partial functions with client for easier usage
 def create_spotify_tools(client: spotipy.Spotify = None) -> Dict[str, Callable]:
     """Create a collection of spotify tools with bound client."""
-    client = client or create_spotify_client()
+    client = client or get_spotify_client()
     return {
         'search_tracks': partial(search_tracks, client),
         'create_playlist': partial(create_playlist, client)
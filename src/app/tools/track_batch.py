@@ -0,0 +1,159 @@
+"""
+track_batch.py - Columnar batch of track dicts
+
+Search results, playlist candidates and step outputs are lists of track
+dicts. Filtering, deduplicating and sorting them one dict at a time means a
+Python call per track per pass. TrackBatch reads the fields those passes
+need into NumPy columns once, so each pass is a single vectorized mask or
+index over the whole batch.
+
+The original dicts are kept alongside the columns and every operation
+selects from them by index, so converting back with to_dicts() returns the
+same dicts in the same shape without copying them.
+
+Numeric columns use MISSING (-1) where a track has no usable value.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+MISSING = -1
+
+# Columns sort_by() and filter_range() accept
+NUMERIC_COLUMNS = ("years", "popularity", "duration_ms")
+
+
+def _int_column(values: List[Any]) -> np.ndarray:
+    """Integer column with MISSING where a value is absent or not a number."""
+    return np.array(
+        [value if isinstance(value, int) and not isinstance(value, bool) else MISSING for value in values],
+        dtype=np.int64
+    )
+
+
+def _year_column(release_dates: List[str]) -> np.ndarray:
+    """Release years parsed from YYYY[-MM[-DD]] dates, MISSING if unparsable."""
+    prefixes = np.array(release_dates, dtype="U4")
+    valid = (np.char.str_len(prefixes) == 4) & np.char.isdigit(prefixes)
+    years = np.full(len(prefixes), MISSING, dtype=np.int64)
+    years[valid] = prefixes[valid].astype(np.int64)
+    return years
+
+
+class TrackBatch:
+    """Track dicts with their URI and numeric fields held as NumPy columns."""
+
+    __slots__ = ("records", "uris", "years", "popularity", "duration_ms")
+
+    def __init__(
+        self,
+        records: np.ndarray,
+        uris: np.ndarray,
+        years: np.ndarray,
+        popularity: np.ndarray,
+        duration_ms: np.ndarray
+    ):
+        self.records = records
+        self.uris = uris
+        self.years = years
+        self.popularity = popularity
+        self.duration_ms = duration_ms
+
+    @classmethod
+    def from_dicts(cls, tracks: Iterable[Dict[str, Any]]) -> "TrackBatch":
+        """Build a batch from track dicts, skipping anything that isn't a dict."""
+        tracks = [track for track in tracks if isinstance(track, dict)]
+        records = np.empty(len(tracks), dtype=object)
+        records[:] = tracks
+        return cls(
+            records=records,
+            uris=np.array([track.get("uri") or "" for track in tracks], dtype=str),
+            years=_year_column([track.get("release_date") or "" for track in tracks]),
+            popularity=_int_column([track.get("popularity") for track in tracks]),
+            duration_ms=_int_column([track.get("duration_ms") for track in tracks])
+        )
+
+    @classmethod
+    def concat(cls, batches: Iterable["TrackBatch"]) -> "TrackBatch":
+        """Join batches end to end."""
+        batches = list(batches)
+        if not batches:
+            return cls.from_dicts([])
+        return cls(*(np.concatenate([getattr(batch, name) for batch in batches]) for name in cls.__slots__))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """The batch's track dicts, in batch order."""
+        return self.records.tolist()
+
+    def uri_list(self) -> List[str]:
+        """The batch's URIs, in batch order."""
+        return self.uris.tolist()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, key: Union[int, slice, np.ndarray, List[int]]) -> Union[Dict[str, Any], "TrackBatch"]:
+        """A single track dict for an int; a sub-batch for a slice, index array or mask."""
+        if isinstance(key, (int, np.integer)):
+            return self.records[key]
+        return self.take(key)
+
+    def take(self, index: Union[slice, np.ndarray, List[int]]) -> "TrackBatch":
+        """Sub-batch selected by a slice, index array or boolean mask."""
+        return TrackBatch(*(getattr(self, name)[index] for name in self.__slots__))
+
+    def filter_years(
+        self,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None,
+        keep_unknown: bool = False
+    ) -> "TrackBatch":
+        """Tracks released within [min_year, max_year]; tracks without a year are dropped unless keep_unknown."""
+        return self.filter_range("years", min_year, max_year, keep_unknown)
+
+    def filter_range(
+        self,
+        column: str,
+        low: Optional[int] = None,
+        high: Optional[int] = None,
+        keep_unknown: bool = False
+    ) -> "TrackBatch":
+        """Tracks whose numeric column lies within [low, high], bounds inclusive."""
+        values = self._numeric(column)
+        known = values != MISSING
+        mask = known.copy()
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        if keep_unknown:
+            mask |= ~known
+        return self.take(mask)
+
+    def dedup(self, exclude: Optional[Iterable[str]] = None) -> "TrackBatch":
+        """
+        First occurrence of each URI, in batch order.
+
+        Tracks without a URI are dropped, as are URIs in exclude.
+        """
+        _, first = np.unique(self.uris, return_index=True)
+        first.sort()
+        keep = first[self.uris[first] != ""]
+        if exclude:
+            keep = keep[~np.isin(self.uris[keep], np.array(list(exclude), dtype=str))]
+        return self.take(keep)
+
+    def sort_by(self, column: str, descending: bool = False) -> "TrackBatch":
+        """
+        Stable sort on a numeric column.
+
+        Ties keep their batch order. Tracks missing the value sort first
+        ascending and last descending.
+        """
+        values = self._numeric(column)
+        return self.take(np.argsort(-values if descending else values, kind="stable"))
+
+    def _numeric(self, column: str) -> np.ndarray:
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"Unknown column '{column}'. Choose from: {', '.join(NUMERIC_COLUMNS)}")
+        return getattr(self, column)
@@ -0,0 +1,196 @@
+"""
+track_catalog.py - Local catalog of every track we've seen
+
+Tracks returned by Spotify searches are persisted to SQLite with an FTS5
+index over name, artist, album and release year. In local-first search
+mode, search_spotify answers from this index and only calls the Spotify
+API on a miss or when the index returns fewer than TRACK_CATALOG_MIN_HITS
+tracks (default: the requested limit).
+
+Search terms are prefix-matched and OR-ed, ranked by bm25, so mood-style
+queries like "upbeat workout" still hit tracks matching some of the words.
+"""
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Dict, Optional, Any
+
+# Words that show up in search phrasing but never in track metadata
+STOPWORDS = {"by", "song", "songs", "track", "tracks", "music"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    uri TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    album TEXT NOT NULL,
+    release_date TEXT NOT NULL,
+    year INTEGER,
+    popularity INTEGER,
+    duration_ms INTEGER
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+    name, artist, album, year, content='tracks', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+    INSERT INTO tracks_fts (rowid, name, artist, album, year)
+    VALUES (new.rowid, new.name, new.artist, new.album, new.year);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+    INSERT INTO tracks_fts (tracks_fts, rowid, name, artist, album, year)
+    VALUES ('delete', old.rowid, old.name, old.artist, old.album, old.year);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE ON tracks BEGIN
+    INSERT INTO tracks_fts (tracks_fts, rowid, name, artist, album, year)
+    VALUES ('delete', old.rowid, old.name, old.artist, old.album, old.year);
+    INSERT INTO tracks_fts (rowid, name, artist, album, year)
+    VALUES (new.rowid, new.name, new.artist, new.album, new.year);
+END;
+"""
+
+
+# Columns added after the first release, migrated onto existing catalogs
+ADDED_COLUMNS = {"popularity": "INTEGER", "duration_ms": "INTEGER"}
+
+
+def build_match_query(keyword: str) -> Optional[str]:
+    """Turn a free-text search into an FTS5 query matching any term by prefix."""
+    terms = [t for t in re.findall(r"\w+", keyword.lower()) if t not in STOPWORDS]
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"*' for term in dict.fromkeys(terms))
+
+
+def _release_year(release_date: str) -> Optional[int]:
+    try:
+        return int(release_date[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+class TrackCatalog:
+    """SQLite/FTS5 catalog of tracks keyed by Spotify URI."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(tracks)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE tracks ADD COLUMN {column} {column_type}")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.local_misses = 0
+
+    def add_tracks(self, tracks: List[Dict]) -> None:
+        """Insert or update tracks in the catalog."""
+        rows = [
+            (
+                track['uri'],
+                track.get('name', ''),
+                track.get('artist', ''),
+                track.get('album', ''),
+                track.get('release_date', ''),
+                _release_year(track.get('release_date', '')),
+                track.get('popularity'),
+                track.get('duration_ms')
+            )
+            for track in tracks if track.get('uri')
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO tracks (uri, name, artist, album, release_date, year, popularity, duration_ms) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(uri) DO UPDATE SET name = excluded.name, artist = excluded.artist, "
+                "album = excluded.album, release_date = excluded.release_date, year = excluded.year, "
+                "popularity = COALESCE(excluded.popularity, popularity), "
+                "duration_ms = COALESCE(excluded.duration_ms, duration_ms)",
+                rows
+            )
+            self._db.commit()
+
+    def search(self, keyword: str, limit: int = 10, max_year: Optional[int] = None) -> List[Dict]:
+        """Search the catalog, best matches first, in the search_tracks shape."""
+        match = build_match_query(keyword)
+        if match is None:
+            return []
+
+        sql = (
+            "SELECT t.name, t.uri, t.artist, t.album, t.release_date, t.popularity, t.duration_ms "
+            "FROM tracks_fts JOIN tracks t ON t.rowid = tracks_fts.rowid "
+            "WHERE tracks_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        if max_year:
+            sql += " AND t.year <= ?"
+            params.append(max_year)
+        sql += " ORDER BY bm25(tracks_fts) LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+
+        return [
+            {
+                'name': name,
+                'uri': uri,
+                'artist': artist,
+                'album': album,
+                'release_date': release_date,
+                'popularity': popularity,
+                'duration_ms': duration_ms
+            }
+            for name, uri, artist, album, release_date, popularity, duration_ms in rows
+        ]
+
+    def record_lookup(self, hit: bool) -> None:
+        """Count a local-first lookup as a hit or a miss."""
+        with self._lock:
+            if hit:
+                self.local_hits += 1
+            else:
+                self.local_misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Report catalog size and local-first hit rate."""
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+            lookups = self.local_hits + self.local_misses
+            return {
+                "tracks": size,
+                "local_hits": self.local_hits,
+                "local_misses": self.local_misses,
+                "hit_rate": self.local_hits / lookups if lookups else 0.0,
+            }
+
+
+_catalog: Optional[TrackCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_track_catalog() -> Optional[TrackCatalog]:
+    """Get the process-wide track catalog, or None when it is disabled."""
+    global _catalog
+    path = os.getenv("TRACK_CATALOG_PATH", "track_catalog.db")
+    if not path:
+        return None
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = TrackCatalog(path)
+    return _catalog
+
+
+def local_min_hits(limit: int) -> int:
+    """Local matches needed to answer a search without calling Spotify (TRACK_CATALOG_MIN_HITS)."""
+    min_hits = int(os.getenv("TRACK_CATALOG_MIN_HITS", "0")) or limit
+    return max(1, min(min_hits, limit))
+
+
+def is_local_first() -> bool:
+    """Whether search_spotify should answer from the catalog before the API."""
+    return os.getenv("SPOTIFY_SEARCH_MODE", "api").lower() == "local_first"